@@ -1,7 +1,18 @@
-import requests
-import hashlib
+import os
+import sys
+import argparse
+import threading
+from bisect import bisect_left
+import time
 import matplotlib.pyplot as plt
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # Repository root, for the shared common/ package
+from common.backend_client import get_client, print_pool_metrics
+from common.hashing import HASH_STRATEGIES, get_hash_strategy, jump_hash
+from common.affinity import AffinityCache
+from common.health import add_health_arguments, start_health_checker
+from common.outlier import add_outlier_arguments, build_outlier_detector
+
 # Server class to represent a server in the load balancer
 class Server:
     def __init__(self, ip, port, weight=1):
@@ -9,6 +20,7 @@ class Server:
         self.port = port
         self.weight = weight
         self.request_count = 0  # Track the number of requests for this server
+        self.active = True  # Cleared by the health checker while the server is down
 
 # Initialize servers (all are included in the pool)
 servers = [
@@ -18,28 +30,129 @@ servers = [
     Server("127.0.0.1", 5004, weight=1)
 ]
 
+# Client-to-server mappings: "modulo" is hash % N (today's placements, but adding a server moves almost
+# every client); "jump" and "consistent" move only about 1/N of clients when a server is added
+AFFINITY_MODES = ("modulo", "jump", "consistent")
+
 # IP Hash Load Balancer
 class IPHashLoadBalancer:
-    def __init__(self, servers):
-        self.servers = servers
+    def __init__(self, servers, hash_strategy="md5", mode="modulo", virtual_nodes=100, debug=False, cache_size=0):
+        if mode not in AFFINITY_MODES:
+            raise ValueError(f"Unknown affinity mode {mode!r}, choose from: {', '.join(AFFINITY_MODES)}")
+        self.servers = list(servers)  # Replaced, not mutated, when membership changes
+        self.hash = get_hash_strategy(hash_strategy)  # "md5" keeps today's client-to-server placements
+        self.mode = mode
+        self.virtual_nodes = virtual_nodes  # Ring points per server in "consistent" mode
+        self.debug = debug  # Print the hash of every request
+        self.cache = AffinityCache(cache_size) if cache_size else None  # Client IP -> server index, skips rehashing repeat clients
+        self.lock = threading.Lock()
+        self._rebuild()
+
+    def _rebuild(self):
+        """Recompute the ring (consistent mode) and fallback list after a membership change."""
+        if self.mode == "consistent":
+            points = sorted((self.hash.hash64(f"{server.ip}:{server.port}#{i}"), index)
+                            for index, server in enumerate(self.servers) for i in range(self.virtual_nodes))
+            self.ring_keys = [point for point, _ in points]
+            self.ring_owners = [self.servers[index] for _, index in points]
+        self.active_servers = [server for server in self.servers if server.active]  # Fallbacks, rebuilt only when a server goes up or down
+        self._publish({server: i for i, server in enumerate(self.servers)})
+
+    def _publish(self, server_index):
+        """Swap in a new (generation, servers, server index) snapshot once the membership or health change is in place."""
+        generation = self.cache.invalidate() if self.cache is not None else 0
+        self.pool = (generation, self.servers, server_index)  # One assignment, so readers never see a mixed snapshot
 
     def get_next_server(self, client_ip):
-        # Generate a hash of the client IP and determine the server index
-        hashed_ip = hashlib.md5(client_ip.encode()).hexdigest()
-        server_index = int(hashed_ip, 16) % len(self.servers)
-        
-        # Debug output to understand hash distribution
-        print(f"Client IP: {client_ip}, Hashed IP: {hashed_ip}, Server Index: {server_index}")
+        # Read the snapshot before any server state: a choice made against it is cached under its generation,
+        # which a concurrent add/remove or health change has already invalidated if it lands mid-call
+        generation, servers, server_index = self.pool
+        if self.cache is not None:
+            index = self.cache.get(client_ip, generation)
+            # A hit is only trusted while its server is still active
+            if index is not None and servers[index].active:
+                if self.debug:
+                    print(f"Client IP: {client_ip}, cached, Server: {servers[index].port}")
+                return servers[index]
+
+        # Generate a hash of the client IP and map it to a server
+        if self.mode == "modulo":
+            hashed_ip = self.hash(client_ip)
+            server = servers[hashed_ip % len(servers)]
+        elif self.mode == "jump":
+            hashed_ip = self.hash.hash64(client_ip)
+            server = servers[jump_hash(hashed_ip, len(servers))]
+        else:
+            hashed_ip = self.hash.hash64(client_ip)
+            server = self._ring_lookup(hashed_ip)
+
+        if server is None or not server.active:
+            # Only clients of a down server are moved; everyone else keeps their placement
+            server = self._fallback(client_ip, hashed_ip)
+            if server is None:
+                print(f"Client IP: {client_ip}: no active servers available.")
+                return None
+
+        if self.debug:
+            print(f"Client IP: {client_ip}, Hashed IP: {hashed_ip:x}, Mode: {self.mode}, Server: {server.port}")
 
-        return self.servers[server_index]
+        index = server_index.get(server)  # None if the ring or fallback list has moved past this snapshot
+        if self.cache is not None and index is not None:
+            self.cache.put(client_ip, index, generation)
+        return server
+
+    def _ring_lookup(self, hashed_ip):
+        """First active server clockwise from the key; down servers are stepped over, not removed."""
+        ring_keys, ring_owners = self.ring_keys, self.ring_owners
+        start = bisect_left(ring_keys, hashed_ip)
+        for step in range(len(ring_keys)):
+            server = ring_owners[(start + step) % len(ring_keys)]
+            if server.active:
+                return server
+        return None
+
+    def _fallback(self, client_ip, hashed_ip):
+        active_servers = self.active_servers
+        if not active_servers:
+            return None
+        if self.mode == "jump":
+            # Re-jump with salted keys so a down server's clients spread over the rest and return when it recovers
+            for attempt in range(1, len(self.servers)):
+                server = self.servers[jump_hash(self.hash.hash64(f"{client_ip}#{attempt}"), len(self.servers))]
+                if server.active:
+                    return server
+        return active_servers[hashed_ip % len(active_servers)]
+
+    def set_server_active(self, server, active):
+        """Health checker hook: mark a server up or down and rebuild the fallback list once."""
+        with self.lock:
+            server.active = active
+            self.active_servers = [s for s in self.servers if s.active]
+            self._publish(self.pool[2])
+
+    def add_server(self, server):
+        with self.lock:
+            self.servers = self.servers + [server]
+            self._rebuild()
+
+    def remove_server(self, server):
+        """Take a server out of the pool for good. In jump mode only removing the last server is cheap;
+        use set_server_active(server, False) to take out one in the middle."""
+        with self.lock:
+            self.servers = [s for s in self.servers if s is not server]
+            self._rebuild()
 
 # Function to simulate requests
-def simulate_requests(load_balancer, num_requests):
+def simulate_requests(load_balancer, num_requests, outlier=None):
     for i in range(num_requests):
         # Generate unique client IP addresses to improve distribution
         client_ip = f"192.168.1.{i % 20}"  # Simulate IPs from 192.168.1.0 to 192.168.1.19
 
         server = load_balancer.get_next_server(client_ip)
+        if server is None:
+            continue
+        if outlier is not None:
+            outlier.on_request(server)
         algorithm = "IP Hash"
         request_number = i + 1  # Start counting from 1
 
@@ -49,12 +162,34 @@ def simulate_requests(load_balancer, num_requests):
         server.request_count += 1
 
         # Sending a request to the server
+        start_time = time.perf_counter()
         try:
-            response = requests.get(f'http://{server.ip}:{server.port}/?request_number={request_number}&algorithm={algorithm}')
+            response = get_client(server).get('/', params={'request_number': request_number, 'algorithm': algorithm})
+            if outlier is not None:
+                outlier.record_response(server, response.status_code, time.perf_counter() - start_time)
             print(response.text)
         except Exception as e:
+            if outlier is not None:
+                outlier.record_failure(server, type(e).__name__)
             print(f"Error requesting server {server.port}: {e}")
 
+# Share of clients that land on a different server when a server is added, then when one goes down
+def measure_remapping(hash_strategy="md5", num_clients=10000):
+    client_ips = [f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}" for i in range(num_clients)]
+    print(f"Clients moved out of {num_clients} (ideal for 4 -> 5 servers is 20% for both):")
+    print(f"{'Mode':<12}{'add a server':>14}{'one server down':>17}")
+    for mode in AFFINITY_MODES:
+        pool = [Server("127.0.0.1", 5001 + i) for i in range(4)]
+        load_balancer = IPHashLoadBalancer(pool, hash_strategy, mode)
+        before = [load_balancer.get_next_server(ip) for ip in client_ips]
+        load_balancer.add_server(Server("127.0.0.1", 5005))
+        after_add = [load_balancer.get_next_server(ip) for ip in client_ips]
+        load_balancer.set_server_active(pool[1], False)
+        after_down = [load_balancer.get_next_server(ip) for ip in client_ips]
+        moved_add = sum(old is not new for old, new in zip(before, after_add)) / num_clients
+        moved_down = sum(old is not new for old, new in zip(after_add, after_down)) / num_clients
+        print(f"{mode:<12}{moved_add:>13.1%}{moved_down:>17.1%}")
+
 # Function to plot request distribution
 def plot_request_distribution(servers):
     ports = [server.port for server in servers]
@@ -71,9 +206,33 @@ def plot_request_distribution(servers):
 
 # Running the simulation
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="IP Hash load balancer simulation")
+    parser.add_argument("--hash", default="md5", choices=sorted(HASH_STRATEGIES), help="Hash strategy (md5 keeps today's placements)")
+    parser.add_argument("--mode", default="modulo", choices=AFFINITY_MODES, help="Client-to-server mapping (modulo keeps today's placements)")
+    parser.add_argument("--debug", action="store_true", help="Print the hash and chosen server for every request")
+    parser.add_argument("--cache-size", type=int, default=4096, help="Client IPs whose server choice is cached (0 disables the cache)")
+    parser.add_argument("--remap-report", action="store_true", help="Show how many clients move on a membership or health change in each mode and exit")
+    add_health_arguments(parser)
+    add_outlier_arguments(parser)
+    args = parser.parse_args()
+    if args.remap_report:
+        measure_remapping(args.hash)
+        sys.exit(0)
+
     num_requests = 100  # Change this to the desired number of requests
-    load_balancer = IPHashLoadBalancer(servers)
-    simulate_requests(load_balancer, num_requests)
+    load_balancer = IPHashLoadBalancer(servers, hash_strategy=args.hash, mode=args.mode, debug=args.debug, cache_size=args.cache_size)
+    outlier = build_outlier_detector(args, servers, load_balancer.set_server_active)
+    health_checker = start_health_checker(args, servers, outlier.health_changed if outlier is not None else load_balancer.set_server_active)
+    simulate_requests(load_balancer, num_requests, outlier)
+    if health_checker is not None:
+        health_checker.stop()
+        health_checker.print_status()
+    if outlier is not None:
+        outlier.stop()
+        outlier.print_status()
+    if load_balancer.cache is not None:
+        load_balancer.cache.print_metrics()
+    print_pool_metrics()
 
     # Plot the request distribution after simulation
     plot_request_distribution(servers)
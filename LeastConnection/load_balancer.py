@@ -1,19 +1,38 @@
-import requests
+import os
+import sys
+import io
+import math
+import argparse
+import contextlib
 import time
 import threading
 import random
 import matplotlib.pyplot as plt
 from collections import deque
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # Repository root, for the shared common/ package
+from common.backend_client import get_client, print_pool_metrics
+from common.indexed_heap import IndexedHeap
+from common.counters import AtomicCounter
+from common.dispatch import BoundedExecutor
+from common.pending import PendingQueue, OVERFLOW_POLICIES
+from common.health import add_health_arguments, start_health_checker
+from common.outlier import add_outlier_arguments, build_outlier_detector
+from common.stats import percentile
+
 class Server:
     def __init__(self, ip, port, weight=1):
         self.ip = ip
         self.port = port
         self.weight = weight
-        self.active_connections = 0  
+        self.connections = AtomicCounter()  # Open connections, updated from request threads
         self.request_count = 0  
         self.active = True  
 
+    @property
+    def active_connections(self):
+        return self.connections.value
+
 # Initialize servers
 servers = [
     Server("127.0.0.1", 5001, weight=1),
@@ -24,34 +43,177 @@ servers = [
 
 # Least Connection Load Balancer
 class LeastConnectionLoadBalancer:
-    def __init__(self, servers):
+    algorithm = "Least Connection"
+
+    def __init__(self, servers, executor=None, pending=None):
         self.servers = servers
-        self.request_queue = deque()  # Queue to store requests when no servers are active
+        self.executor = executor  # BoundedExecutor for request handling; None starts a thread per request
+        self.outlier = None  # OutlierDetector told about every outcome; built after the balancer since it calls set_server_active
+        self.pending = pending if pending is not None else PendingQueue(on_discard=report_discarded_request)  # Requests that arrived while no server was active
+        self.lock = threading.Lock()  # Guards the selection state; only selections and state changes take it
+        self._build_selection_state()
+
+    def _build_selection_state(self):
+        self.order = {server: i for i, server in enumerate(self.servers)}  # Ties go to the earlier server
+        self.heap = IndexedHeap()  # Active servers keyed on (connection count, order)
+        self.released = deque()  # Servers whose heap position is stale after a release (deque appends are thread-safe)
+        for server in self.servers:
+            if server.active:
+                self.heap.push(server, self._priority(server))
+
+    def _priority(self, server):
+        return (server.active_connections, self.order[server])
 
     def get_next_server(self):
-        active_servers = [server for server in self.servers if server.active]
-        
-        if not active_servers:
-            print("No active servers available. Request will be queued.")
-            return None
-        
-        least_loaded_server = min(active_servers, key=lambda server: server.active_connections)
-        least_loaded_server.active_connections += 1  
-        least_loaded_server.request_count += 1  
+        with self.lock:
+            if not self.heap:
+                print("No active servers available. Request will be queued.")
+                return None
+
+            self._apply_releases()
+            least_loaded_server = self.heap.peek()
+            connections = least_loaded_server.connections.increment()
+            least_loaded_server.request_count += 1  
+            self.heap.update(least_loaded_server, self._priority(least_loaded_server))
 
-        print(f"Selected Server {least_loaded_server.port} with {least_loaded_server.active_connections - 1} connections (before increment)\n")
+        print(f"Selected Server {least_loaded_server.port} with {connections - 1} connections (before increment)\n")
         return least_loaded_server
 
+    def release_connection(self, server, latency=None):
+        # Only the server's own counter lock is taken here; the heap catches up on the next selection.
+        # latency is accepted for interface parity with LatencyAwareLoadBalancer and not used.
+        connections = server.connections.decrement()
+        self.released.append(server)
+        print(f"Server {server.port}: Active connection released. Total active: {connections}")
+        return connections
+
+    def _apply_releases(self):
+        """Re-sift servers released since the last selection; called with self.lock held."""
+        while self.released:
+            server = self.released.popleft()
+            if server in self.heap:
+                self.heap.update(server, self._priority(server))
+
+    def set_server_active(self, server, active, drain=True):
+        """Add a server to or drop it from the selection heap in O(log n)."""
+        with self.lock:
+            self._apply_releases()
+            server.active = active
+            if active and server not in self.heap:
+                self.heap.push(server, self._priority(server))
+            elif not active and server in self.heap:
+                self.heap.remove(server)
+        if active and drain:
+            self.process_queued_requests()  # Drain the backlog the moment a server is back
+
     def queue_request(self, request):
-        self.request_queue.append(request)
-        print(f"Request queued: {request}")
+        if self.pending.put(request):
+            print(f"Request queued: {request}")
+        # A server may have come back between the failed selection and the put
+        if self._has_active_server():
+            self.process_queued_requests()
+
+    def _has_active_server(self):
+        with self.lock:
+            return bool(self.heap)
 
     def process_queued_requests(self):
-        while self.request_queue:
-            request = self.request_queue.popleft()
-            server = self.get_next_server()
-            if server:
-                threading.Thread(target=handle_request, args=(server, request['number'], request['algorithm'])).start()
+        return self.pending.drain(self._dispatch_queued)
+
+    def _dispatch_queued(self, request):
+        server = self.get_next_server()
+        if server is None:
+            return False
+        self.dispatch(server, request['number'], request['algorithm'])
+        return True
+
+    def dispatch(self, server, request_number, algorithm):
+        """Hand a request to the worker pool (blocking while it is full), or to a new thread without one."""
+        if self.outlier is not None:
+            self.outlier.on_request(server)
+        if self.executor is not None:
+            return self.executor.submit(handle_request, self, server, request_number, algorithm)
+        thread = threading.Thread(target=handle_request, args=(self, server, request_number, algorithm))
+        thread.start()
+        return thread
+
+# Latency statistics for one backend, decayed by elapsed time rather than by sample count
+class LatencyStats:
+    def __init__(self):
+        self.ewma = 0.0
+        self.samples = 0
+        self.last_update = time.monotonic()
+        self.lock = threading.Lock()
+
+    def observe(self, latency, decay, peak):
+        with self.lock:
+            now = time.monotonic()
+            weight = math.exp(-(now - self.last_update) / decay)  # Old estimate fades to 1/e after `decay` seconds
+            self.last_update = now
+            if self.samples == 0 or (peak and latency > self.ewma):
+                self.ewma = latency  # Peak EWMA: jump to a new high at once, then decay away from it slowly
+            else:
+                self.ewma = self.ewma * weight + latency * (1 - weight)
+            self.samples += 1
+
+# Latency-Aware Load Balancer: power of two choices over (peak) EWMA latency x (in-flight + 1).
+# Each request compares two random active servers, so a pick is O(1) whatever the pool size, and a
+# slow or backed-up server stops winning comparisons as soon as its latency or queue grows.
+class LatencyAwareLoadBalancer(LeastConnectionLoadBalancer):
+    algorithm = "Latency Aware"
+    UNKNOWN_LATENCY_PENALTY = 1.0  # Cost (seconds) of a server that has requests in flight but no samples yet
+
+    def __init__(self, servers, executor=None, pending=None, decay=2.0, peak=True, choices=2):
+        self.decay = decay  # Seconds for an old latency sample to fade to 1/e of its weight
+        self.peak = peak  # False uses a plain EWMA instead of peak EWMA
+        self.choices = choices  # Servers compared per pick; len(servers) makes it an exhaustive scan
+        super().__init__(servers, executor=executor, pending=pending)
+
+    def _build_selection_state(self):
+        self.stats = {server: LatencyStats() for server in self.servers}
+        self.active_servers = [server for server in self.servers if server.active]  # Rebuilt only when a server goes up or down
+
+    def cost(self, server):
+        stats = self.stats[server]
+        in_flight = server.active_connections
+        if stats.samples == 0:
+            return self.UNKNOWN_LATENCY_PENALTY + in_flight if in_flight else 0.0
+        return stats.ewma * (in_flight + 1)
+
+    def get_next_server(self):
+        with self.lock:
+            candidates = self.active_servers
+            if not candidates:
+                print("No active servers available. Request will be queued.")
+                return None
+
+            if len(candidates) > self.choices:
+                candidates = random.sample(candidates, self.choices)
+            chosen_server = min(candidates, key=self.cost)
+            cost = self.cost(chosen_server)
+            connections = chosen_server.connections.increment()
+            chosen_server.request_count += 1
+
+        print(f"Selected Server {chosen_server.port} with cost {cost * 1000:.2f} ms and {connections - 1} connections (before increment)\n")
+        return chosen_server
+
+    def release_connection(self, server, latency=None):
+        if latency is not None:
+            self.stats[server].observe(latency, self.decay, self.peak)
+        connections = server.connections.decrement()
+        print(f"Server {server.port}: Active connection released. Total active: {connections}")
+        return connections
+
+    def set_server_active(self, server, active, drain=True):
+        """Mark a server up or down; the candidate list is rebuilt here rather than on every request."""
+        with self.lock:
+            server.active = active
+            self.active_servers = [s for s in self.servers if s.active]
+        if active and drain:
+            self.process_queued_requests()
+
+    def _has_active_server(self):
+        return bool(self.active_servers)
 
 # Function to simulate requests
 def simulate_requests(load_balancer, num_requests):
@@ -60,60 +222,159 @@ def simulate_requests(load_balancer, num_requests):
         server = load_balancer.get_next_server()
         
         if server is None:
-            request = {'number': request_number, 'algorithm': "Least Connection"}
+            request = {'number': request_number, 'algorithm': load_balancer.algorithm}
             load_balancer.queue_request(request)
-            time.sleep(15)  
-            set_server_states_after_wait()
-            load_balancer.process_queued_requests()
             continue
         
-        thread = threading.Thread(target=handle_request, args=(server, request_number, "Least Connection"))
-        thread.start()
+        load_balancer.dispatch(server, request_number, load_balancer.algorithm)
 
 # Function to handle individual requests
-def handle_request(server, request_number, algorithm):
+def handle_request(load_balancer, server, request_number, algorithm):
+    outlier = load_balancer.outlier
+    latency = None
     try:
-        response = requests.get(f'http://{server.ip}:{server.port}/?request_number={request_number}&algorithm={algorithm}')
+        start_time = time.perf_counter()
+        response = get_client(server).get('/', params={'request_number': request_number, 'algorithm': algorithm})
+        latency = time.perf_counter() - start_time
+        if outlier is not None:
+            outlier.record_response(server, response.status_code, latency)
         print(response.text)
 
-        time.sleep(random.uniform(0.5, 2.0))  
-
     except Exception as e:
+        if outlier is not None:
+            outlier.record_failure(server, type(e).__name__)
         print(f"Error requesting server {server.port}: {e}")
     finally:
-        server.active_connections -= 1
-        print(f"Server {server.port}: Active connection released. Total active: {server.active_connections}")
+        load_balancer.release_connection(server, latency)
 
-def plot_request_distribution(servers):
+def plot_request_distribution(servers, algorithm="Least Connection"):
     server_names = [f"Server {server.port}" for server in servers]
     request_counts = [server.request_count for server in servers]
 
     plt.bar(server_names, request_counts, color='blue')
     plt.xlabel('Servers')
     plt.ylabel('Number of Requests Handled')
-    plt.title('Request Distribution Among Servers (Least Connection)')
+    plt.title(f'Request Distribution Among Servers ({algorithm})')
     plt.xticks(rotation=45)
     plt.tight_layout()  
     plt.show()
 
-def set_initial_server_states():
-    for server in servers:
+def set_initial_server_states(load_balancer):
+    for server in load_balancer.servers:
         command = input(f"Should Server {server.port} be active? (yes/no): ").strip().lower()
-        server.active = (command == 'yes')
+        load_balancer.set_server_active(server, command == 'yes')
+
+def schedule_server_recovery(load_balancer, delay):
+    """Bring every inactive server back after `delay` seconds without blocking the request loop."""
+    def recover():
+        for server in load_balancer.servers:
+            if not server.active:
+                load_balancer.set_server_active(server, True, drain=False)
+                print(f"Server {server.port} is now active.")
+        load_balancer.process_queued_requests()  # Once, so the backlog spreads over every recovered server
+
+    timer = threading.Timer(delay, recover)
+    timer.daemon = True
+    timer.start()
+    return timer
+
+def report_discarded_request(request, reason):
+    print(f"Request {request['number']} {reason} by the pending queue")
+
+# Benchmark: least connection vs latency-aware picks when the backends run at different speeds
+BENCHMARK_SERVICE_TIMES = [0.005, 0.005, 0.010, 0.040]  # Mean seconds per request for each simulated backend
+BENCHMARK_SERVER_CAPACITY = 4  # Requests a simulated backend works on at once; the rest wait for a slot
 
-def set_server_states_after_wait():
-    for server in servers:
-        command = input(f"Should Server {server.port} be active now? (yes/no): ").strip().lower()
-        server.active = (command == 'yes')
-        if server.active:
-            print(f"Server {server.port} is now active.")
+def benchmark_latency_aware(num_requests=4000, concurrency=8, service_times=BENCHMARK_SERVICE_TIMES, capacity=BENCHMARK_SERVER_CAPACITY):
+    contenders = [
+        ("Least Connection", lambda pool: LeastConnectionLoadBalancer(pool)),
+        ("P2C EWMA", lambda pool: LatencyAwareLoadBalancer(pool, peak=False)),
+        ("P2C peak-EWMA", lambda pool: LatencyAwareLoadBalancer(pool)),
+    ]
+    print(f"Service times (ms): {[t * 1000 for t in service_times]}, {capacity} slots per backend, "
+          f"{concurrency} concurrent clients, {num_requests} requests")
+    print(f"{'Algorithm':<18}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}   Requests per server")
+
+    for label, make_balancer in contenders:
+        pool = [Server("127.0.0.1", 7001 + i) for i in range(len(service_times))]
+        slots = {server: threading.Semaphore(capacity) for server in pool}
+        mean_service = dict(zip(pool, service_times))
+        load_balancer = make_balancer(pool)
+        issued = AtomicCounter()
+        latencies = []
+
+        def client():
+            while issued.increment() <= num_requests:
+                server = load_balancer.get_next_server()
+                start_time = time.perf_counter()
+                with slots[server]:
+                    time.sleep(random.expovariate(1 / mean_service[server]))
+                latency = time.perf_counter() - start_time
+                latencies.append(latency)
+                load_balancer.release_connection(server, latency)
+
+        threads = [threading.Thread(target=client) for _ in range(concurrency)]
+        start_time = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):  # Silence the per-request messages
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        elapsed = time.perf_counter() - start_time
+
+        ordered = sorted(latencies)
+        counts = [server.request_count for server in pool]
+        print(f"{label:<18}{len(ordered) / elapsed:>9.0f}{percentile(ordered, 50) * 1000:>9.1f}"
+              f"{percentile(ordered, 95) * 1000:>9.1f}{percentile(ordered, 99) * 1000:>9.1f}   {counts}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="LeastConnectionLoadBalancer simulation")
+    parser.add_argument("--algorithm", choices=["least-connection", "latency-aware"], default="least-connection", help="Server selection policy")
+    parser.add_argument("--benchmark", action="store_true", help="Compare least connection with latency-aware picks on simulated backends of different speeds and exit")
+    parser.add_argument("--workers", type=int, default=32, help="Worker threads handling requests")
+    parser.add_argument("--queue-size", type=int, default=64, help="Requests allowed to wait for a worker before the simulation blocks")
+    parser.add_argument("--thread-per-request", action="store_true", help="Start an unbounded thread per request instead of using the worker pool")
+    parser.add_argument("--pending-size", type=int, default=100, help="Requests held while no server is active")
+    parser.add_argument("--pending-deadline", type=float, default=30.0, help="Seconds a held request may wait before it times out")
+    parser.add_argument("--overflow", choices=OVERFLOW_POLICIES, default="reject", help="What to do with a new request when the pending queue is full")
+    parser.add_argument("--manual-states", action="store_true", help="Ask which servers are active instead of health checking them")
+    parser.add_argument("--recovery-delay", type=float, default=15.0, help="With --manual-states, seconds before inactive servers come back")
+    add_health_arguments(parser)
+    add_outlier_arguments(parser)
+    args = parser.parse_args()
+    if args.benchmark:
+        benchmark_latency_aware()
+        sys.exit(0)
+
     num_requests = 100 
-    load_balancer = LeastConnectionLoadBalancer(servers)
+    executor = None if args.thread_per_request else BoundedExecutor(args.workers, args.queue_size)
+    pending = PendingQueue(args.pending_size, args.pending_deadline, args.overflow, on_discard=report_discarded_request)
+    balancer_class = LatencyAwareLoadBalancer if args.algorithm == "latency-aware" else LeastConnectionLoadBalancer
+    load_balancer = balancer_class(servers, executor=executor, pending=pending)
+    load_balancer.outlier = build_outlier_detector(args, servers, load_balancer.set_server_active)
+    on_health_change = load_balancer.outlier.health_changed if load_balancer.outlier is not None else load_balancer.set_server_active
     
-    set_initial_server_states()
+    recovery = health_checker = None
+    if args.manual_states:
+        set_initial_server_states(load_balancer)
+        recovery = schedule_server_recovery(load_balancer, args.recovery_delay)
+    else:
+        health_checker = start_health_checker(args, servers, on_health_change)
     
     simulate_requests(load_balancer, num_requests)
+    pending.join()  # Held requests go out as soon as a server recovers, or time out
+    if recovery is not None:
+        recovery.cancel()
+    if health_checker is not None:
+        health_checker.stop()
+        health_checker.print_status()
+    if load_balancer.outlier is not None:
+        load_balancer.outlier.stop()
+        load_balancer.outlier.print_status()
+    if executor is not None:
+        executor.shutdown(wait=True)  # Drain in-flight requests so the plot sees the final counts
+        executor.print_metrics()
+    pending.print_metrics()
+    print_pool_metrics()
 
-    plot_request_distribution(servers)
+    plot_request_distribution(servers, load_balancer.algorithm)
@@ -1,69 +1,352 @@
+import argparse
+import heapq
+import math
+import os
+import sys
+import time
 import numpy as np
 import matplotlib.pyplot as plt
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # Repository root, for the shared common/ package
+from common.hashing import get_hash_strategy
+from common.service_time import PARETO_ALPHA, ServiceProfile
+
+# Discrete-event simulation of the load-balancing policies. Requests arrive (Poisson, or replayed
+# from a trace), the policy picks a server, and the server works through its FCFS queue with
+# `capacity` requests in service at once and a speed equal to its weight. Completions live on a
+# heapq of departure events and are applied before every arrival, so policies that look at the
+# load (least connection, latency aware) see exactly what is in flight at that instant.
+# Every policy replays the same arrivals, service demands and clients, and the report gives the
+# p50/p95/p99 sojourn time (queueing + service) per policy.
+#
+#   python load_balancer.py
+#   python load_balancer.py --rates 100 --requests 2000000 --no-plot
+#   python load_balancer.py --trace arrivals.txt --service-time bimodal:0.02:0.5:0.02 --capacity 4
+
 # Define parameters
-arrival_rates = np.array([10, 20, 50, 75, 100])  # requests per second
-num_requests = 1000  # total requests per simulation
-num_servers = 3  # number of servers
-
-# Define server capacities for Weighted Round Robin
-server_weights = [1, 2, 3]  # Server 1, 2, and 3 weights
-
-# Functions for Load Balancing Algorithms
-def calculate_response_time(arrival_rate):
-    # Simulate an exponential increase in response time with arrival rate
-    return np.exp(arrival_rate / 100) * 0.01  # Base response time scaled by arrival rate
-
-def round_robin(requests):
-    latencies = []
-    for i in range(len(requests)):
-        server = i % num_servers
-        latency = requests[i] * calculate_response_time(requests[i])
-        latencies.append(latency)
-    return np.mean(latencies)
-
-def weighted_round_robin(requests, weights):
-    latencies = []
-    server_indices = np.repeat(range(num_servers), weights)
-    for i in range(len(requests)):
-        server = server_indices[i % len(server_indices)]
-        latency = requests[i] * calculate_response_time(requests[i])
-        latencies.append(latency)
-    return np.mean(latencies)
-
-def least_connection(requests):
-    latencies = []
-    connections = [0] * num_servers  # Connection count for each server
-    for i in range(len(requests)):
-        server = np.argmin(connections)  # Select server with least connections
-        connections[server] += 1
-        latency = requests[i] * calculate_response_time(requests[i])
-        latencies.append(latency)
-        connections[server] -= 1  # Assume request is processed, reduce connection count
-    return np.mean(latencies)
-
-# Run Simulation for each arrival rate
-rr_latencies, wrr_latencies, lc_latencies = [], [], []
-
-for rate in arrival_rates:
-    requests = np.random.poisson(rate, num_requests)
-    
-    rr_latencies.append(round_robin(requests))
-    wrr_latencies.append(weighted_round_robin(requests, server_weights))
-    lc_latencies.append(least_connection(requests))
-
-# Plotting
-plt.figure(figsize=(10, 6))
-
-# Assign distinct colors and styles to each algorithm
-plt.plot(arrival_rates, rr_latencies, label="Round Robin", marker='o', color='blue', markersize=8, linestyle='-')
-plt.plot(arrival_rates, wrr_latencies, label="Weighted Round Robin", marker='x', color='green', markersize=8, linestyle='--')
-plt.plot(arrival_rates, lc_latencies, label="Least Connection", marker='s', color='red', markersize=8, linestyle=':')
-
-plt.xlabel("Arrival Rate (requests/sec)")
-plt.ylabel("Mean Latency (s)")
-plt.title("Average Latency of Different Algorithms at Different Arrival Rates")
-plt.legend()
-plt.grid(True)
-plt.ylim(0, max(rr_latencies + wrr_latencies + lc_latencies) * 1.1)  # Adjust y-axis limit for better visibility
-plt.show()
+arrival_rates = [10, 20, 50, 75, 100]  # requests per second
+num_requests = 200000  # requests per simulation
+server_weights = [1, 2, 3]  # Server 1, 2, and 3 weights; a server's speed is its weight
+service_time = "exponential:0.05"  # Service demand at speed 1, see common/service_time.py for the specs
+num_clients = 1000  # distinct client addresses, for IP hashing
+
+# Server in the simulation: relative speed, concurrent service slots and the WRR/WLC weight
+class SimServer:
+    def __init__(self, index, weight=1, capacity=1):
+        self.index = index
+        self.weight = weight
+        self.speed = float(weight)
+        self.capacity = capacity
+
+# Round Robin: servers in turn
+class RoundRobinPolicy:
+    name = "Round Robin"
+
+    def __init__(self, servers, outstanding, stream):
+        self.count = len(servers)
+        self.next = 0
+
+    def choose(self, i, now):
+        server = self.next
+        self.next = (server + 1) % self.count
+        return server
+
+# Weighted Round Robin: one precomputed cycle of smooth WRR picks
+class WeightedRoundRobinPolicy:
+    name = "Weighted Round Robin"
+
+    def __init__(self, servers, outstanding, stream):
+        total_weight = sum(server.weight for server in servers)
+        current_weights = [0] * len(servers)
+        self.schedule = []
+        for _ in range(total_weight):
+            for server in servers:
+                current_weights[server.index] += server.weight
+            best = max(range(len(servers)), key=current_weights.__getitem__)
+            current_weights[best] -= total_weight
+            self.schedule.append(best)
+
+    def choose(self, i, now):
+        return self.schedule[i % len(self.schedule)]
+
+# Least Connection: fewest requests in service or queued, ties to the earlier server (as in LeastConnection/)
+class LeastConnectionPolicy:
+    name = "Least Connection"
+
+    def __init__(self, servers, outstanding, stream):
+        self.order = range(len(servers))
+        self.outstanding = outstanding
+
+    def choose(self, i, now):
+        return min(self.order, key=self.outstanding.__getitem__)
+
+# Weighted Least Connection: fewest connections per unit of weight (as in WeightedLeastConnection/)
+class WeightedLeastConnectionPolicy:
+    name = "Weighted Least Connection"
+
+    def __init__(self, servers, outstanding, stream):
+        self.order = range(len(servers))
+        self.inverse_weights = [1.0 / server.weight for server in servers]
+        self.outstanding = outstanding
+
+    def choose(self, i, now):
+        outstanding, inverse_weights = self.outstanding, self.inverse_weights
+        return min(self.order, key=lambda s: outstanding[s] * inverse_weights[s])
+
+# IP Hash: the client's address hashed onto the servers (IPHash's default md5 modulo mode)
+class IPHashPolicy:
+    name = "IP Hash"
+
+    def __init__(self, servers, outstanding, stream):
+        hash_function = get_hash_strategy("md5")
+        by_client = [hash_function(client_address(c)) % len(servers) for c in range(stream.num_clients)]
+        self.assignments = [by_client[c] for c in stream.clients]  # The mapping is fixed, so resolve it up front
+
+    def choose(self, i, now):
+        return self.assignments[i]
+
+# Latency Aware: power of two choices over peak EWMA sojourn x (in-flight + 1), as in LeastConnection/
+class LatencyAwarePolicy:
+    name = "Latency Aware"
+    UNKNOWN_LATENCY_PENALTY = 1.0  # Cost (seconds) of a server that has requests in flight but no samples yet
+
+    def __init__(self, servers, outstanding, stream, decay=2.0):
+        self.decay = decay  # Simulated seconds for an old sample to fade to 1/e of its weight
+        self.outstanding = outstanding
+        self.first, self.second = stream.pairs
+        self.ewma = [0.0] * len(servers)
+        self.samples = [0] * len(servers)
+        self.last_update = [0.0] * len(servers)
+
+    def cost(self, server):
+        in_flight = self.outstanding[server]
+        if self.samples[server] == 0:
+            return self.UNKNOWN_LATENCY_PENALTY + in_flight if in_flight else 0.0
+        return self.ewma[server] * (in_flight + 1)
+
+    def choose(self, i, now):
+        a, b = self.first[i], self.second[i]
+        return a if self.cost(a) <= self.cost(b) else b
+
+    def complete(self, server, sojourn, now):
+        if self.samples[server] == 0 or sojourn > self.ewma[server]:
+            self.ewma[server] = sojourn  # Peak EWMA: jump to a new high at once, then decay away from it slowly
+        else:
+            weight = math.exp(-(now - self.last_update[server]) / self.decay)
+            self.ewma[server] = self.ewma[server] * weight + sojourn * (1 - weight)
+        self.last_update[server] = now
+        self.samples[server] += 1
+
+POLICIES = {
+    "rr": RoundRobinPolicy,
+    "wrr": WeightedRoundRobinPolicy,
+    "lc": LeastConnectionPolicy,
+    "wlc": WeightedLeastConnectionPolicy,
+    "hash": IPHashPolicy,
+    "latency-aware": LatencyAwarePolicy,
+}
+
+def client_address(client):
+    return f"10.{client >> 16 & 255}.{client >> 8 & 255}.{client & 255}"
+
+def sample_service_demand(profile, rng, n):
+    """n service demands (seconds at speed 1) from a common/service_time.py profile, drawn with numpy."""
+    kind, p = profile.distribution, profile.params
+    if kind == "none":
+        return np.zeros(n)
+    if kind == "constant":
+        return np.full(n, p[0])
+    if kind == "uniform":
+        return rng.uniform(p[0], p[1], n)
+    if kind == "exponential":
+        return rng.exponential(p[0], n)
+    if kind == "lognormal":
+        return p[0] * np.exp(p[1] * rng.standard_normal(n))
+    fast, slow, slow_share = p
+    return np.where(rng.random(n) < slow_share, slow * (rng.pareto(PARETO_ALPHA, n) + 1), rng.exponential(fast, n))
+
+# One event stream shared by every policy: arrival times, service demands, clients and P2C candidate pairs
+class EventStream:
+    def __init__(self, arrivals, demands, clients, num_servers, num_clients, rng):
+        self.arrivals = arrivals.tolist()
+        self.demands = demands.tolist()
+        self.clients = clients.tolist()
+        self.num_clients = num_clients
+        first = rng.integers(0, num_servers, len(arrivals))
+        second = (first + rng.integers(1, num_servers, len(arrivals))) % num_servers if num_servers > 1 else first
+        self.pairs = (first.tolist(), second.tolist())
+        self.mean_demand = float(demands.mean()) if len(demands) else 0.0
+
+    def __len__(self):
+        return len(self.arrivals)
+
+    @classmethod
+    def poisson(cls, rate, n, profile, num_servers, num_clients=num_clients, seed=None):
+        rng = np.random.default_rng(seed)
+        arrivals = np.cumsum(rng.exponential(1.0 / rate, n))
+        return cls(arrivals, sample_service_demand(profile, rng, n), rng.integers(0, num_clients, n), num_servers, num_clients, rng)
+
+    @classmethod
+    def from_trace(cls, path, profile, num_servers, num_clients=num_clients, seed=None):
+        """Replay a whitespace-separated trace: arrival time in seconds, then optionally demand and client id."""
+        rng = np.random.default_rng(seed)
+        trace = read_trace(path)
+        trace = trace[np.argsort(trace[:, 0], kind="stable")]
+        n = len(trace)
+        arrivals = trace[:, 0] - trace[0, 0]
+        demands = trace[:, 1] if trace.shape[1] > 1 else sample_service_demand(profile, rng, n)
+        if trace.shape[1] > 2:
+            clients = trace[:, 2].astype(np.int64)
+            num_clients = int(clients.max()) + 1
+        else:
+            clients = rng.integers(0, num_clients, n)
+        return cls(arrivals, demands, clients, num_servers, num_clients, rng)
+
+def read_trace(path):
+    """Parse a trace file into an (n, columns) array; raises ValueError naming the first bad line."""
+    rows = []
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            fields = line.split('#', 1)[0].split()
+            if not fields:
+                continue  # Blank or comment-only line
+            try:
+                row = [float(field) for field in fields]
+            except ValueError:
+                raise ValueError(f"{path}:{line_number}: expected numbers, got {line.strip()!r}") from None
+            if not 1 <= len(row) <= 3:
+                raise ValueError(f"{path}:{line_number}: expected 1 to 3 columns (time [demand [client]]), got {len(row)}")
+            if rows and len(row) != len(rows[0]):
+                raise ValueError(f"{path}:{line_number}: {len(row)} columns, but earlier lines have {len(rows[0])}")
+            if not all(np.isfinite(row)) or (len(row) > 1 and row[1] < 0):
+                raise ValueError(f"{path}:{line_number}: times must be finite and demands non-negative")
+            if len(row) > 2 and (row[2] < 0 or row[2] != int(row[2])):
+                raise ValueError(f"{path}:{line_number}: client id must be a non-negative integer, got {fields[2]}")
+            rows.append(row)
+    if not rows:
+        raise ValueError(f"{path}: trace has no requests")
+    return np.array(rows)
+
+def simulate(policy_class, servers, stream):
+    """Run one policy over the stream; returns the sojourn time of every request, in arrival order."""
+    outstanding = [0] * len(servers)  # Requests in service or queued, per server
+    policy = policy_class(servers, outstanding, stream)
+    choose = policy.choose
+    complete = getattr(policy, "complete", None)
+    speeds = [server.speed for server in servers]
+    slots = [[0.0] * server.capacity for server in servers]  # Heap of the times each service slot frees up
+    departures = []  # Heap of (finish time, server, sojourn)
+    sojourns = [0.0] * len(stream)
+    heappush, heappop, heapreplace = heapq.heappush, heapq.heappop, heapq.heapreplace
+
+    for i, (now, demand) in enumerate(zip(stream.arrivals, stream.demands)):
+        while departures and departures[0][0] <= now:
+            finished_at, server, sojourn = heappop(departures)
+            outstanding[server] -= 1
+            if complete is not None:
+                complete(server, sojourn, finished_at)
+
+        server = choose(i, now)
+        outstanding[server] += 1
+        free = slots[server]
+        start = free[0] if free[0] > now else now  # FCFS: wait for the earliest free slot
+        finish = start + demand / speeds[server]
+        heapreplace(free, finish)
+        sojourn = finish - now
+        heappush(departures, (finish, server, sojourn))
+        sojourns[i] = sojourn
+    return np.array(sojourns)
+
+def summarize(sojourns):
+    p50, p95, p99 = np.percentile(sojourns, [50, 95, 99]) if len(sojourns) else (0.0, 0.0, 0.0)
+    return {'p50': p50, 'p95': p95, 'p99': p99, 'mean': float(sojourns.mean()) if len(sojourns) else 0.0}
+
+def run_policies(policy_names, servers, stream):
+    results = {}
+    for name in policy_names:
+        start_time = time.perf_counter()
+        results[name] = summarize(simulate(POLICIES[name], servers, stream))
+        results[name]['elapsed'] = time.perf_counter() - start_time
+    return results
+
+def print_results(title, results, num_requests):
+    print(f"\n{title}")
+    print(f"  {'Policy':<26}{'p50 (ms)':>12}{'p95 (ms)':>12}{'p99 (ms)':>12}{'mean (ms)':>12}{'req/s simulated':>17}")
+    for name, r in results.items():
+        rate = num_requests / r['elapsed'] if r['elapsed'] else float('inf')
+        print(f"  {POLICIES[name].name:<26}{r['p50'] * 1000:>12.2f}{r['p95'] * 1000:>12.2f}{r['p99'] * 1000:>12.2f}"
+              f"{r['mean'] * 1000:>12.2f}{rate:>17,.0f}")
+
+def plot_results(rates, results_by_rate, policy_names):
+    plt.figure(figsize=(10, 6))
+    markers = ['o', 'x', 's', '^', 'D', 'v']
+    for k, name in enumerate(policy_names):
+        plt.plot(rates, [results_by_rate[rate][name]['p99'] for rate in rates], label=POLICIES[name].name,
+                 marker=markers[k % len(markers)], markersize=8)
+    plt.xlabel("Arrival Rate (requests/sec)")
+    plt.ylabel("p99 Sojourn Time (s)")
+    plt.title("Tail Latency of Different Algorithms at Different Arrival Rates")
+    plt.yscale("log")
+    plt.legend()
+    plt.grid(True)
+    plt.show()
+
+def parse_list(text, cast):
+    return [cast(part) for part in text.split(',') if part.strip()]
+
+def main():
+    parser = argparse.ArgumentParser(description="Discrete-event simulation of the load-balancing policies")
+    parser.add_argument("--rates", default=','.join(str(r) for r in arrival_rates), help="Poisson arrival rates to sweep (requests/sec)")
+    parser.add_argument("--requests", type=int, default=num_requests, help="Requests per simulation")
+    parser.add_argument("--weights", default=','.join(str(w) for w in server_weights), help="Server weights, which are also their speeds")
+    parser.add_argument("--capacity", help="Requests each server serves at once, one value or one per server (default: the /CAP of --service-time, else 1)")
+    parser.add_argument("--service-time", default=service_time, help="Service demand at speed 1, e.g. exponential:0.05 or bimodal:0.02:0.5:0.02")
+    parser.add_argument("--policies", default=','.join(POLICIES), help=f"Policies to compare, from: {', '.join(POLICIES)}")
+    parser.add_argument("--trace", help="Replay arrivals from this file (time [demand [client]] per line) instead of Poisson")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed, for repeatable runs")
+    parser.add_argument("--no-plot", action="store_true", help="Print the tables only")
+    args = parser.parse_args()
+
+    try:
+        profile = ServiceProfile.parse(args.service_time)
+    except ValueError as e:
+        parser.error(str(e))
+    policy_names = parse_list(args.policies, str)
+    unknown = [name for name in policy_names if name not in POLICIES]
+    if unknown:
+        parser.error(f"Unknown policies {', '.join(unknown)}, choose from: {', '.join(POLICIES)}")
+    weights = parse_list(args.weights, int)
+    capacities = parse_list(args.capacity, int) if args.capacity else [profile.concurrency or 1]
+    if len(capacities) == 1:
+        capacities *= len(weights)
+    if len(capacities) != len(weights) or min(weights) < 1 or min(capacities) < 1:
+        parser.error("--weights and --capacity need positive values, and --capacity one value or one per server")
+    servers = [SimServer(i, weight, capacity) for i, (weight, capacity) in enumerate(zip(weights, capacities))]
+    total_capacity = sum(server.speed * server.capacity for server in servers)
+    print(f"{len(servers)} servers, weights {weights}, capacities {capacities}, service time {profile} at speed 1")
+
+    if args.trace:
+        try:
+            stream = EventStream.from_trace(args.trace, profile, len(servers), seed=args.seed)
+        except (OSError, ValueError) as e:
+            parser.error(f"--trace: {e}")
+        duration = stream.arrivals[-1] if len(stream) > 1 else 0.0
+        offered = len(stream) / duration * stream.mean_demand / total_capacity if duration else 0.0
+        print_results(f"Trace {args.trace}: {len(stream):,} requests over {duration:.1f}s (utilization {offered:.0%})",
+                      run_policies(policy_names, servers, stream), len(stream))
+        return
+
+    rates = parse_list(args.rates, float)
+    results_by_rate = {}
+    for rate in rates:
+        stream = EventStream.poisson(rate, args.requests, profile, len(servers), seed=args.seed)
+        utilization = rate * stream.mean_demand / total_capacity
+        results_by_rate[rate] = run_policies(policy_names, servers, stream)
+        print_results(f"Arrival rate {rate:g}/s: {args.requests:,} requests (utilization {utilization:.0%})",
+                      results_by_rate[rate], args.requests)
+
+    if not args.no_plot:
+        plot_results(rates, results_by_rate, policy_names)
+
+if __name__ == "__main__":
+    main()
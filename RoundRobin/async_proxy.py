@@ -0,0 +1,149 @@
+import argparse
+import asyncio
+import time
+import os
+import sys
+import aiohttp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # Repository root, for the shared common/ package
+from common.health import add_health_arguments, start_health_checker
+from common.outlier import add_outlier_arguments, build_outlier_detector
+from load_balancer import (
+    RoundRobinLoadBalancer,
+    servers,
+    simulate_requests,
+    report_throughput,
+    plot_request_distribution,
+)
+
+# Asyncio forwarding engine for the Round Robin load balancer.
+# Requests are pushed through a bounded queue (back-pressure) and forwarded by a fixed
+# number of worker tasks (concurrency limit) over one keep-alive connection pool per server.
+class AsyncProxyEngine:
+    def __init__(self, load_balancer, concurrency=200, max_connections_per_server=100,
+                 queue_size=None, timeout=10.0, algorithm="Round Robin", outlier=None):
+        self.load_balancer = load_balancer
+        self.outlier = outlier  # OutlierDetector told about every outcome, or None
+        self.concurrency = concurrency
+        self.max_connections_per_server = max_connections_per_server
+        self.queue_size = queue_size or concurrency * 2  # Producer blocks once this many requests are waiting
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.algorithm = algorithm
+        self.sessions = {}  # (ip, port) -> ClientSession with its own keep-alive pool
+        self.latencies = []
+        self.errors = 0
+
+    def _session_for(self, server):
+        key = (server.ip, server.port)
+        session = self.sessions.get(key)
+        if session is None:
+            connector = aiohttp.TCPConnector(limit=self.max_connections_per_server, keepalive_timeout=30)
+            session = aiohttp.ClientSession(
+                base_url=f"http://{server.ip}:{server.port}",
+                connector=connector,
+                timeout=self.timeout,
+            )
+            self.sessions[key] = session
+        return session
+
+    async def forward(self, request_number):
+        server = self.load_balancer.get_next_server()
+        if server is None:
+            self.errors += 1
+            return
+        if self.outlier is not None:
+            self.outlier.on_request(server)
+        session = self._session_for(server)
+        params = {"request_number": request_number, "algorithm": self.algorithm}
+
+        start_time = time.perf_counter()
+        try:
+            async with session.get("/", params=params) as response:
+                await response.read()
+            latency = time.perf_counter() - start_time
+            self.latencies.append(latency)
+            if self.outlier is not None:
+                self.outlier.record_response(server, response.status, latency)
+            server.request_count += 1
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.errors += 1
+            if self.outlier is not None:
+                self.outlier.record_failure(server, type(e).__name__)
+            print(f"Error communicating with server {server.port}: {e!r}")
+
+    async def _worker(self, queue):
+        while True:
+            request_number = await queue.get()
+            try:
+                if request_number is None:  # Shutdown sentinel
+                    return
+                await self.forward(request_number)
+            finally:
+                queue.task_done()
+
+    async def run(self, num_requests):
+        """Forward num_requests requests and return the elapsed wall-clock time."""
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        workers = [asyncio.create_task(self._worker(queue)) for _ in range(self.concurrency)]
+
+        start_time = time.perf_counter()
+        try:
+            for i in range(num_requests):
+                await queue.put(i + 1)  # Waits while the queue is full
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await self.close()
+        return time.perf_counter() - start_time
+
+    async def close(self):
+        for session in self.sessions.values():
+            await session.close()
+        self.sessions.clear()
+
+
+def reset_request_counts(servers):
+    for server in servers:
+        server.request_count = 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Asyncio Round Robin forwarding engine")
+    parser.add_argument("--requests", type=int, default=10000, help="Number of requests to send")
+    parser.add_argument("--concurrency", type=int, default=200, help="Maximum number of in-flight requests")
+    parser.add_argument("--connections", type=int, default=100, help="Keep-alive pool size per server")
+    parser.add_argument("--queue-size", type=int, default=None, help="Pending request queue size (default: 2 x concurrency)")
+    parser.add_argument("--compare", action="store_true", help="Also run the sequential requests.get path")
+    add_health_arguments(parser)
+    add_outlier_arguments(parser)
+    args = parser.parse_args()
+
+    load_balancer = RoundRobinLoadBalancer(servers)
+    outlier = build_outlier_detector(args, servers, load_balancer.set_server_active)
+    health_checker = start_health_checker(args, servers, outlier.health_changed if outlier is not None else load_balancer.set_server_active)
+
+    if args.compare:
+        start_time = time.perf_counter()
+        latencies = simulate_requests(load_balancer, args.requests, outlier)
+        report_throughput("Sequential Round Robin", latencies, time.perf_counter() - start_time, args.requests)
+        reset_request_counts(servers)
+
+    engine = AsyncProxyEngine(
+        load_balancer,
+        concurrency=args.concurrency,
+        max_connections_per_server=args.connections,
+        queue_size=args.queue_size,
+        outlier=outlier,
+    )
+    elapsed = asyncio.run(engine.run(args.requests))
+    report_throughput(f"Async Round Robin (concurrency {args.concurrency})", engine.latencies, elapsed, args.requests)
+    if health_checker is not None:
+        health_checker.stop()
+        health_checker.print_status()
+    if outlier is not None:
+        outlier.stop()
+        outlier.print_status()
+
+    plot_request_distribution(servers)
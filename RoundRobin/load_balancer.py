@@ -1,6 +1,17 @@
+import os
+import sys
+import argparse
+import threading
 import requests
+import time
 import matplotlib.pyplot as plt
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # Repository root, for the shared common/ package
+from common.backend_client import get_client, print_pool_metrics
+from common.health import add_health_arguments, start_health_checker
+from common.outlier import add_outlier_arguments, build_outlier_detector
+from common.stats import percentile
+
 # Server class to represent a server in the load balancer
 class Server:
     def __init__(self, ip, port, weight=1):
@@ -8,6 +19,7 @@ class Server:
         self.port = port
         self.weight = weight
         self.request_count = 0  # Initialize request count for each server
+        self.active = True  # Cleared by the health checker while the server is down
 
 # Initialize servers (removed the duplicate server)
 servers = [
@@ -22,27 +34,63 @@ class RoundRobinLoadBalancer:
     def __init__(self, servers):
         self.servers = servers
         self.current_index = 0
+        self.lock = threading.Lock()
+        self.active_servers = [server for server in servers if server.active]  # Rebuilt only when a server goes up or down
 
     def get_next_server(self):
-        server = self.servers[self.current_index]
-        self.current_index = (self.current_index + 1) % len(self.servers)
+        active_servers = self.active_servers  # Read once; a health change swaps in a new list rather than mutating this one
+        if not active_servers:
+            print("No active servers available.")
+            return None
+        server = active_servers[self.current_index % len(active_servers)]
+        self.current_index = (self.current_index + 1) % len(active_servers)
         return server
 
-# Function to simulate requests
-def simulate_requests(load_balancer, num_requests):
+    def set_server_active(self, server, active):
+        """Health checker hook: mark a server up or down and rebuild the active list once."""
+        with self.lock:
+            server.active = active
+            self.active_servers = [s for s in self.servers if s.active]
+
+# Function to simulate requests (returns the latency of every successful request)
+def simulate_requests(load_balancer, num_requests, outlier=None):
+    latencies = []
     for i in range(num_requests):
         server = load_balancer.get_next_server()
         algorithm = "Round Robin"
         request_number = i + 1  # Start counting from 1
 
+        if server is None:
+            continue
+        if outlier is not None:
+            outlier.on_request(server)
+
         # Sending a request to the server
+        start_time = time.perf_counter()
         try:
-            response = requests.get(f'http://{server.ip}:{server.port}/?request_number={request_number}&algorithm={algorithm}')
+            response = get_client(server).get('/', params={'request_number': request_number, 'algorithm': algorithm})
+            latency = time.perf_counter() - start_time
+            latencies.append(latency)
+            if outlier is not None:
+                outlier.record_response(server, response.status_code, latency)
             print(response.text)
             # Increment the request count for the server
             server.request_count += 1
         except requests.exceptions.RequestException as e:
+            if outlier is not None:
+                outlier.record_failure(server, type(e).__name__)
             print(f"Error communicating with server {server.port}: {e}")
+    return latencies
+
+# Function to print achieved throughput and latency percentiles for a run
+def report_throughput(label, latencies, elapsed, num_requests):
+    ordered = sorted(latencies)
+    errors = num_requests - len(ordered)
+    rps = len(ordered) / elapsed if elapsed > 0 else 0.0
+    print(f"\n{label}: {len(ordered)}/{num_requests} requests in {elapsed:.2f}s ({errors} errors)")
+    print(f"  Throughput: {rps:.1f} requests/sec")
+    print(f"  Latency p50: {percentile(ordered, 50) * 1000:.2f} ms, p99: {percentile(ordered, 99) * 1000:.2f} ms")
+    return rps
 
 # Function to plot the request distribution
 def plot_request_distribution(servers):
@@ -59,9 +107,25 @@ def plot_request_distribution(servers):
 
 # Running the simulation
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Round Robin load balancer simulation")
+    add_health_arguments(parser)
+    add_outlier_arguments(parser)
+    args = parser.parse_args()
+
     num_requests = 1000  # Change this to the desired number of requests
     load_balancer = RoundRobinLoadBalancer(servers)
-    simulate_requests(load_balancer, num_requests)
+    outlier = build_outlier_detector(args, servers, load_balancer.set_server_active)
+    health_checker = start_health_checker(args, servers, outlier.health_changed if outlier is not None else load_balancer.set_server_active)
+    start_time = time.perf_counter()
+    latencies = simulate_requests(load_balancer, num_requests, outlier)
+    report_throughput("Sequential Round Robin", latencies, time.perf_counter() - start_time, num_requests)
+    if health_checker is not None:
+        health_checker.stop()
+        health_checker.print_status()
+    if outlier is not None:
+        outlier.stop()
+        outlier.print_status()
+    print_pool_metrics()
     
     # Plot the request distribution after simulation
     plot_request_distribution(servers)
@@ -1,59 +1,226 @@
-import hashlib
+import os
+import sys
+import argparse
 import bisect
+import math
+from collections import namedtuple, Counter
+import numpy as np
 import matplotlib.pyplot as plt
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # Repository root, for the shared common/ package
+from common.hashing import HASH_STRATEGIES, get_hash_strategy
+
+# Half-open range [start, end) of hash values whose owner changed from old_server to new_server
+RingArc = namedtuple('RingArc', ['start', 'end', 'old_server', 'new_server'])
+
 class ConsistentHashRing:
-    def __init__(self, num_replicas=3):
+    def __init__(self, num_replicas=3, hash_strategy="md5", load_factor=None):
+        if load_factor is not None and not load_factor > 0:
+            # With a factor of zero or less the capacity can fall below the average load, so no server may have room
+            raise ValueError(f"Load factor must be greater than 0, got {load_factor}")
         self.ring = dict()  # Maps hash values to virtual nodes (server replicas)
         self.sorted_keys = []  # Keeps track of the sorted hash keys
         self.num_replicas = num_replicas
         self.servers = []  # To keep track of added servers
+        self.owners = dict()  # Maps hash values to the main server owning that replica
+        self.replica_hashes = dict()  # Caches each server's replica positions so removal never re-hashes
+        self._ring_arrays = None  # Cached (positions, owner indexes) NumPy arrays, rebuilt after membership changes
+        self.hash_strategy = get_hash_strategy(hash_strategy)  # "md5" keeps today's ring positions
+        self.load_factor = load_factor  # Bounded-load mode when set: each server takes at most ceil((1 + load_factor) * average)
+        self.loads = dict()  # Live requests per server, maintained by acquire/release
+        self.total_load = 0
 
     def _hash(self, key):
-        """Generate an MD5 hash and convert it to an integer."""
-        hash_value = int(hashlib.md5(key.encode('utf-8')).hexdigest(), 16)
-        return hash_value
+        """Hash a key to its ring position with the configured hash strategy."""
+        return self.hash_strategy(key)
+
+    def _hash64(self, key):
+        """Fixed 64-bit form of _hash, which sorts in the same order."""
+        return self.hash_strategy.hash64(key)
 
     def add_server(self, server):
-        """Add a server to the hash ring with replicas."""
-        self.servers.append(server)  # Keep track of added servers
-        for i in range(self.num_replicas):
-            replica_key = f"{server}-{i}"  # Create unique key for each replica
-            hashed_key = self._hash(replica_key)
-            self.ring[hashed_key] = replica_key  # Store replica in the ring
-            bisect.insort(self.sorted_keys, hashed_key)  # Keep keys sorted
-        print(f"Added server {server} with {self.num_replicas} replicas.")
+        """Add a server to the hash ring with replicas; returns the arcs that changed owner."""
+        return self.add_servers([server])
 
     def remove_server(self, server):
-        """Remove a server and its replicas from the hash ring."""
-        if server in self.servers:
-            self.servers.remove(server)  # Remove from servers list
+        """Remove a server and its replicas from the hash ring; returns the arcs that changed owner."""
+        return self.remove_servers([server])
+
+    def add_servers(self, servers):
+        """Add several servers with one merge of the sorted ring; returns the arcs that changed owner."""
+        new_keys = []
+        for server in servers:
+            if server in self.replica_hashes:
+                print(f"Server {server} is already present on the ring.")
+                continue
+            self.servers.append(server)  # Keep track of added servers
+            self.loads[server] = 0
+            hashes = []
             for i in range(self.num_replicas):
-                replica_key = f"{server}-{i}"
+                replica_key = f"{server}-{i}"  # Create unique key for each replica
                 hashed_key = self._hash(replica_key)
                 if hashed_key in self.ring:
-                    del self.ring[hashed_key]
-                    self.sorted_keys.remove(hashed_key)
+                    continue  # Position already taken by another replica
+                self.ring[hashed_key] = replica_key  # Store replica in the ring
+                self.owners[hashed_key] = server
+                hashes.append(hashed_key)
+            self.replica_hashes[server] = hashes
+            new_keys.extend(hashes)
+            print(f"Added server {server} with {self.num_replicas} replicas.")
+
+        if not new_keys:
+            return []
+        new_keys.sort()
+        old_keys = self.sorted_keys
+        # Timsort finds the two sorted runs and merges them in a single linear pass
+        self.sorted_keys = old_keys + new_keys
+        self.sorted_keys.sort()
+        self._ring_arrays = None
+        return self._changed_arcs(new_keys, self.sorted_keys, old_keys, added=True)
+
+    def remove_servers(self, servers):
+        """Remove several servers with one filtering pass over the ring; returns the arcs that changed owner."""
+        removed_keys = []
+        for server in servers:
+            if server not in self.replica_hashes:
+                print(f"Server {server} not found.")
+                continue
+            self.servers.remove(server)  # Remove from servers list
+            removed_keys.extend(self.replica_hashes.pop(server))
+            self.total_load -= self.loads.pop(server)
             print(f"Removed server {server}.")
-        else:
-            print(f"Server {server} not found.")
+
+        if not removed_keys:
+            return []
+        removed_keys.sort()
+        removed = set(removed_keys)
+        old_keys = self.sorted_keys
+        self.sorted_keys = [hashed_key for hashed_key in old_keys if hashed_key not in removed]
+        arcs = self._changed_arcs(removed_keys, old_keys, self.sorted_keys, added=False)
+        for hashed_key in removed_keys:
+            del self.ring[hashed_key]
+            del self.owners[hashed_key]
+        self._ring_arrays = None
+        return arcs
+
+    def _owner_after(self, keys, hashed_key):
+        """Main server owning hashed_key on the sorted ring positions keys (None for an empty ring)."""
+        if not keys:
+            return None
+        return self.owners[keys[bisect.bisect(keys, hashed_key) % len(keys)]]
+
+    def _changed_arcs(self, changed_keys, ring_keys, other_keys, added):
+        """Arcs owned by changed_keys on ring_keys, paired with their owner on the ring without them (other_keys)."""
+        ring_size = 1 << self.hash_strategy.bits
+        pieces = []
+        for hashed_key in changed_keys:
+            # A position owns the keys from its predecessor (inclusive) up to itself (exclusive)
+            start = ring_keys[bisect.bisect_left(ring_keys, hashed_key) - 1]
+            if added:
+                old_server, new_server = self._owner_after(other_keys, hashed_key), self.owners[hashed_key]
+            else:
+                old_server, new_server = self.owners[hashed_key], self._owner_after(other_keys, hashed_key)
+            if start < hashed_key:
+                pieces.append((start, hashed_key, old_server, new_server))
+            else:  # Arc wraps past the top of the hash space
+                pieces.append((start, ring_size, old_server, new_server))
+                pieces.append((0, hashed_key, old_server, new_server))
+
+        arcs = []
+        for start, end, old_server, new_server in sorted(pieces, key=lambda piece: piece[0]):
+            if start == end:
+                continue
+            if arcs and arcs[-1].end == start and arcs[-1][2:] == (old_server, new_server):
+                arcs[-1] = arcs[-1]._replace(end=end)  # Neighbouring positions moved between the same servers
+            else:
+                arcs.append(RingArc(start, end, old_server, new_server))
+        return arcs
 
     def get_server(self, request_key):
         """Get the virtual node responsible for handling the request."""
         if not self.ring:
             return None
 
-        hashed_key = self._hash(request_key)
+        return self._lookup(self._hash(request_key))
+
+    def _lookup(self, hashed_key):
+        """Find the virtual node owning an already hashed key."""
         idx = bisect.bisect(self.sorted_keys, hashed_key) % len(self.sorted_keys)
         return self.ring[self.sorted_keys[idx]]  # Return the virtual node (replica)
 
+    def capacity(self, incoming=1):
+        """Bounded-load capacity per server: ceil((1 + load_factor) * average load), counting incoming requests."""
+        return math.ceil((1 + self.load_factor) * (self.total_load + incoming) / len(self.servers))
+
+    def acquire(self, request_key):
+        """Assign a live request to a main server; in bounded-load mode, walk clockwise past servers at capacity."""
+        if not self.ring:
+            return None
+
+        idx = bisect.bisect(self.sorted_keys, self._hash(request_key))
+        num_keys = len(self.sorted_keys)
+        if self.load_factor is None:
+            server = self.owners[self.sorted_keys[idx % num_keys]]
+        else:
+            # Loads sum to less than len(servers) * capacity, so some server is always below it
+            capacity = self.capacity()
+            for step in range(num_keys):
+                server = self.owners[self.sorted_keys[(idx + step) % num_keys]]
+                if self.loads[server] < capacity:
+                    break
+        self.loads[server] += 1
+        self.total_load += 1
+        return server
+
+    def release(self, server):
+        """Release a request returned by acquire once it has finished."""
+        if self.loads.get(server, 0) > 0:
+            self.loads[server] -= 1
+            self.total_load -= 1
+
+    def hash_keys(self, keys):
+        """Hash every key once into a uint64 array that can be routed again after membership changes."""
+        return np.fromiter((self._hash64(key) for key in keys), dtype=np.uint64, count=len(keys))
+
+    def _get_ring_arrays(self):
+        if self._ring_arrays is None:
+            server_index = {server: i for i, server in enumerate(self.servers)}
+            positions = np.array([self.hash_strategy.fixed64(hashed_key) for hashed_key in self.sorted_keys], dtype=np.uint64)
+            owners = np.array([server_index[self.owners[hashed_key]] for hashed_key in self.sorted_keys], dtype=np.int32)
+            self._ring_arrays = (positions, owners)
+        return self._ring_arrays
+
+    def route_hashes(self, hashes):
+        """Resolve pre-hashed keys (from hash_keys) to main-server indexes into self.servers, plus per-server counts."""
+        if not self.sorted_keys:
+            return np.full(len(hashes), -1, dtype=np.int32), np.zeros(0, dtype=np.int64)
+
+        positions, owners = self._get_ring_arrays()
+        # Same "first position strictly after the key" rule as get_server; with 128-bit strategies a key
+        # whose top 64 bits tie with a ring position (probability ~2**-64) may resolve one position further along
+        idx = np.searchsorted(positions, hashes, side='right')
+        idx[idx == len(positions)] = 0  # Wrap around to the start of the ring
+        owner_indexes = owners[idx]
+        return owner_indexes, np.bincount(owner_indexes, minlength=len(self.servers))
+
+    def route_batch(self, keys):
+        """Route a batch of request keys; returns (main-server indexes into self.servers, per-server counts)."""
+        return self.route_hashes(self.hash_keys(keys))
+
+    def migration_plan(self, arcs):
+        """Group changed arcs into {(old_server, new_server): [(start, end), ...]} hash ranges to move."""
+        plan = {}
+        for arc in arcs:
+            plan.setdefault((arc.old_server, arc.new_server), []).append((arc.start, arc.end))
+        return plan
+
     def distribute_requests(self, requests):
         """Distribute the requests among the virtual nodes (servers)."""
         distribution = {}
         hash_mapping = {}  # Store the hashes of requests for visualization
         for request in requests:
             hashed_key = self._hash(request)
-            server = self.get_server(request)  # Get the specific virtual node (replica)
+            server = self._lookup(hashed_key)  # Get the specific virtual node (replica)
             hash_mapping[request] = hashed_key  # Save the hash value
 
             if server not in distribution:
@@ -71,6 +238,43 @@ class ConsistentHashRing:
                 server_counts[server_name] += len(distribution[virtual_node])
         return server_counts
 
+# Stored request keys sorted by ring hash, with the main server currently owning each one
+class KeyIndex:
+    def __init__(self, ring, keys):
+        self.ring = ring
+        entries = sorted((ring._hash(key), key) for key in keys)
+        self.hashes = [hashed_key for hashed_key, _ in entries]
+        self.keys = [key for _, key in entries]
+        self.owners = [ring._owner_after(ring.sorted_keys, hashed_key) for hashed_key in self.hashes]
+        self.counts = Counter(self.owners)  # Keys per main server
+
+    def apply(self, plan):
+        """Move the keys covered by a migration plan; costs O(moved keys + ranges * log n), not a rescan."""
+        moves = {}
+        for (old_server, new_server), ranges in plan.items():
+            moved = 0
+            for start, end in ranges:
+                lo = bisect.bisect_left(self.hashes, start)
+                hi = bisect.bisect_left(self.hashes, end)
+                self.owners[lo:hi] = [new_server] * (hi - lo)
+                moved += hi - lo
+            if moved:
+                self.counts[old_server] -= moved
+                self.counts[new_server] += moved
+                moves[(old_server, new_server)] = moved
+        return moves
+
+    def server_counts(self):
+        """Keys owned by every main server, in the order the servers were added."""
+        return {server: self.counts[server] for server in self.ring.servers}
+
+# Function to print how many keys moved between each pair of main servers
+def print_migration(moves):
+    total = sum(moves.values())
+    print(f"{total} keys moved:")
+    for (old_server, new_server), moved in moves.items():
+        print(f"  {old_server} -> {new_server}: {moved} keys")
+
 # Function to plot request distribution and load balancing
 def plot_distribution(distribution, hash_mapping, server_counts):
     # Plotting request distribution across virtual nodes (server replicas)
@@ -91,7 +295,10 @@ def plot_distribution(distribution, hash_mapping, server_counts):
 
     plt.show()
 
-    # Plotting the total requests handled by each main server
+    plot_server_counts(server_counts)
+
+# Function to plot the total requests handled by each main server
+def plot_server_counts(server_counts):
     plt.figure(figsize=(12, 6))
     servers = list(server_counts.keys())
     total_requests = list(server_counts.values())
@@ -109,10 +316,28 @@ def plot_distribution(distribution, hash_mapping, server_counts):
 
     plt.show()
 
+# Function to compare plain and bounded-load assignment with every request live at once
+def print_bounded_loads(ring, requests):
+    _, plain_counts = ring.route_batch(requests)
+    assigned = [ring.acquire(request) for request in requests]
+    print(f"\nBounded loads (load factor {ring.load_factor}, capacity {ring.capacity(incoming=0)}):")
+    for server, plain_count in zip(ring.servers, plain_counts):
+        print(f"  {server}: {plain_count} -> {ring.loads[server]} requests")
+    for server in assigned:
+        ring.release(server)
+
 # Command-line interaction
 if __name__ == "__main__":
-    consistent_hash = ConsistentHashRing(num_replicas=3)
+    parser = argparse.ArgumentParser(description="Virtual node consistent hashing simulation")
+    parser.add_argument("--hash", default="md5", choices=sorted(HASH_STRATEGIES), help="Hash strategy (md5 keeps today's placements)")
+    parser.add_argument("--load-factor", type=float, default=None, help="Enable bounded loads with capacity ceil((1 + load factor) * average)")
+    args = parser.parse_args()
+    if args.load_factor is not None and not args.load_factor > 0:
+        parser.error(f"--load-factor must be greater than 0, got {args.load_factor}")
+
+    consistent_hash = ConsistentHashRing(num_replicas=3, hash_strategy=args.hash, load_factor=args.load_factor)
     requests = [f"Request_{i}" for i in range(10000)]  # Simulating 100 unique requests
+    key_index = KeyIndex(consistent_hash, requests)  # Kept up to date from the changed arcs instead of rescanning
 
     while True:
         print("\n1. Add Server")
@@ -123,29 +348,29 @@ if __name__ == "__main__":
 
         if choice == '1':
             server_name = input("Enter server name to add (e.g., Server1, Server2): ")
-            consistent_hash.add_server(server_name)
+            arcs = consistent_hash.add_server(server_name)
 
-            # Show new distribution of requests after adding a server
+            # Move only the keys whose owner changed and show the new distribution
             print("\nDistribution after adding server:")
-            distribution, hash_mapping = consistent_hash.distribute_requests(requests)
-            server_counts = consistent_hash.count_requests_per_server(distribution)
-            plot_distribution(distribution, hash_mapping, server_counts)
+            print_migration(key_index.apply(consistent_hash.migration_plan(arcs)))
+            plot_server_counts(key_index.server_counts())
 
         elif choice == '2':
             server_name = input("Enter server name to remove (e.g., Server1, Server2): ")
-            consistent_hash.remove_server(server_name)
+            arcs = consistent_hash.remove_server(server_name)
 
-            # Show new distribution of requests after removing a server
+            # Move only the keys whose owner changed and show the new distribution
             print("\nDistribution after removing server:")
-            distribution, hash_mapping = consistent_hash.distribute_requests(requests)
-            server_counts = consistent_hash.count_requests_per_server(distribution)
-            plot_distribution(distribution, hash_mapping, server_counts)
+            print_migration(key_index.apply(consistent_hash.migration_plan(arcs)))
+            plot_server_counts(key_index.server_counts())
 
         elif choice == '3':
             # Show current request distribution across virtual nodes (server replicas)
             print("\nCurrent distribution of requests:")
             distribution, hash_mapping = consistent_hash.distribute_requests(requests)
             server_counts = consistent_hash.count_requests_per_server(distribution)
+            if consistent_hash.load_factor is not None:
+                print_bounded_loads(consistent_hash, requests)
             plot_distribution(distribution, hash_mapping, server_counts)
 
         elif choice == '4':
@@ -1,19 +1,33 @@
-import requests
+import os
+import sys
+import argparse
 import time
 import threading
-import random
 from collections import deque
 import matplotlib.pyplot as plt  # Importing matplotlib for graphing
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # Repository root, for the shared common/ package
+from common.backend_client import get_client, print_pool_metrics
+from common.indexed_heap import IndexedHeap
+from common.counters import AtomicCounter
+from common.dispatch import BoundedExecutor
+from common.pending import PendingQueue, OVERFLOW_POLICIES
+from common.health import add_health_arguments, start_health_checker
+from common.outlier import add_outlier_arguments, build_outlier_detector
+
 class Server:
     def __init__(self, ip, port, weight=1):
         self.ip = ip
         self.port = port
         self.weight = weight
-        self.active_connections = 0  
+        self.connections = AtomicCounter()  # Open connections, updated from request threads
         self.request_count = 0  
         self.active = True  
 
+    @property
+    def active_connections(self):
+        return self.connections.value
+
 # Initialize servers with different weights
 servers = [
     Server("127.0.0.1", 5001, weight=1),
@@ -24,43 +38,91 @@ servers = [
 
 # Weighted Least Connection Load Balancer
 class WeightedLeastConnectionLoadBalancer:
-    def __init__(self, servers):
+    def __init__(self, servers, executor=None, pending=None):
         self.servers = servers
-        self.request_queue = deque()  # Queue to store requests when no servers are active
+        self.executor = executor  # BoundedExecutor for request handling; None starts a thread per request
+        self.outlier = None  # OutlierDetector told about every outcome; built after the balancer since it calls set_server_active
+        self.pending = pending if pending is not None else PendingQueue(on_discard=report_discarded_request)  # Requests that arrived while no server was active
+        self.order = {server: i for i, server in enumerate(servers)}  # Ties go to the earlier server
+        self.heap = IndexedHeap()  # Active servers keyed on (weighted load, order)
+        self.lock = threading.Lock()  # Guards the heap; only selections and state changes take it
+        self.released = deque()  # Servers whose heap position is stale after a release (deque appends are thread-safe)
+        for server in servers:
+            if server.active:
+                self.heap.push(server, self._priority(server))
+
+    def _priority(self, server):
+        return (server.active_connections / server.weight, self.order[server])
 
     def get_next_server(self):
-        active_servers = [server for server in self.servers if server.active]
-        
-        if not active_servers:
-            print("No active servers available. Request will be queued.")
-            return None
-        
-        # Calculate weighted least connections
-        least_loaded_server = None
-        least_load = float('inf')
-
-        for server in active_servers:
-            load = server.active_connections / server.weight
-            if load < least_load:
-                least_load = load
-                least_loaded_server = server
-
-        least_loaded_server.active_connections += 1  
-        least_loaded_server.request_count += 1  
-
-        print(f"Selected Server {least_loaded_server.port} with {least_loaded_server.active_connections - 1} connections (before increment)\n")
+        with self.lock:
+            if not self.heap:
+                print("No active servers available. Request will be queued.")
+                return None
+
+            self._apply_releases()
+            least_loaded_server = self.heap.peek()
+            connections = least_loaded_server.connections.increment()
+            least_loaded_server.request_count += 1  
+            self.heap.update(least_loaded_server, self._priority(least_loaded_server))
+
+        print(f"Selected Server {least_loaded_server.port} with {connections - 1} connections (before increment)\n")
         return least_loaded_server
 
+    def release_connection(self, server):
+        # Only the server's own counter lock is taken here; the heap catches up on the next selection
+        connections = server.connections.decrement()
+        self.released.append(server)
+        print(f"Server {server.port}: Active connection released. Total active: {connections}")
+        return connections
+
+    def _apply_releases(self):
+        """Re-sift servers released since the last selection; called with self.lock held."""
+        while self.released:
+            server = self.released.popleft()
+            if server in self.heap:
+                self.heap.update(server, self._priority(server))
+
+    def set_server_active(self, server, active, drain=True):
+        """Add a server to or drop it from the selection heap in O(log n)."""
+        with self.lock:
+            self._apply_releases()
+            server.active = active
+            if active and server not in self.heap:
+                self.heap.push(server, self._priority(server))
+            elif not active and server in self.heap:
+                self.heap.remove(server)
+        if active and drain:
+            self.process_queued_requests()  # Drain the backlog the moment a server is back
+
     def queue_request(self, request):
-        self.request_queue.append(request)
-        print(f"Request queued: {request}")
+        if self.pending.put(request):
+            print(f"Request queued: {request}")
+        # A server may have come back between the failed selection and the put
+        with self.lock:
+            has_server = bool(self.heap)
+        if has_server:
+            self.process_queued_requests()
 
     def process_queued_requests(self):
-        while self.request_queue:
-            request = self.request_queue.popleft()
-            server = self.get_next_server()
-            if server:
-                threading.Thread(target=handle_request, args=(server, request['number'], request['algorithm'])).start()
+        return self.pending.drain(self._dispatch_queued)
+
+    def _dispatch_queued(self, request):
+        server = self.get_next_server()
+        if server is None:
+            return False
+        self.dispatch(server, request['number'], request['algorithm'])
+        return True
+
+    def dispatch(self, server, request_number, algorithm):
+        """Hand a request to the worker pool (blocking while it is full), or to a new thread without one."""
+        if self.outlier is not None:
+            self.outlier.on_request(server)
+        if self.executor is not None:
+            return self.executor.submit(handle_request, self, server, request_number, algorithm)
+        thread = threading.Thread(target=handle_request, args=(self, server, request_number, algorithm))
+        thread.start()
+        return thread
 
 # Function to simulate requests
 def simulate_requests(load_balancer, num_requests):
@@ -71,39 +133,48 @@ def simulate_requests(load_balancer, num_requests):
         if server is None:
             request = {'number': request_number, 'algorithm': "Weighted Least Connection"}
             load_balancer.queue_request(request)
-            time.sleep(15)  
-            set_server_states_after_wait()
-            load_balancer.process_queued_requests()
             continue
         
-        thread = threading.Thread(target=handle_request, args=(server, request_number, "Weighted Least Connection"))
-        thread.start()
+        load_balancer.dispatch(server, request_number, "Weighted Least Connection")
 
 # Function to handle individual requests
-def handle_request(server, request_number, algorithm):
+def handle_request(load_balancer, server, request_number, algorithm):
+    outlier = load_balancer.outlier
     try:
-        response = requests.get(f'http://{server.ip}:{server.port}/?request_number={request_number}&algorithm={algorithm}')
+        start_time = time.perf_counter()
+        response = get_client(server).get('/', params={'request_number': request_number, 'algorithm': algorithm})
+        if outlier is not None:
+            outlier.record_response(server, response.status_code, time.perf_counter() - start_time)
         print(response.text)
 
-        time.sleep(random.uniform(0.5, 2.0))  
-
     except Exception as e:
+        if outlier is not None:
+            outlier.record_failure(server, type(e).__name__)
         print(f"Error requesting server {server.port}: {e}")
     finally:
-        server.active_connections -= 1
-        print(f"Server {server.port}: Active connection released. Total active: {server.active_connections}")
+        load_balancer.release_connection(server)
 
-def set_initial_server_states():
-    for server in servers:
+def set_initial_server_states(load_balancer):
+    for server in load_balancer.servers:
         command = input(f"Should Server {server.port} be active? (yes/no): ").strip().lower()
-        server.active = (command == 'yes')
+        load_balancer.set_server_active(server, command == 'yes')
+
+def schedule_server_recovery(load_balancer, delay):
+    """Bring every inactive server back after `delay` seconds without blocking the request loop."""
+    def recover():
+        for server in load_balancer.servers:
+            if not server.active:
+                load_balancer.set_server_active(server, True, drain=False)
+                print(f"Server {server.port} is now active.")
+        load_balancer.process_queued_requests()  # Once, so the backlog spreads over every recovered server
 
-def set_server_states_after_wait():
-    for server in servers:
-        command = input(f"Should Server {server.port} be active now? (yes/no): ").strip().lower()
-        server.active = (command == 'yes')
-        if server.active:
-            print(f"Server {server.port} is now active.")
+    timer = threading.Timer(delay, recover)
+    timer.daemon = True
+    timer.start()
+    return timer
+
+def report_discarded_request(request, reason):
+    print(f"Request {request['number']} {reason} by the pending queue")
 
 def plot_request_distribution(servers):
     server_names = [f"Server {server.port}" for server in servers]
@@ -118,12 +189,48 @@ def plot_request_distribution(servers):
     plt.show()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="WeightedLeastConnectionLoadBalancer simulation")
+    parser.add_argument("--workers", type=int, default=32, help="Worker threads handling requests")
+    parser.add_argument("--queue-size", type=int, default=64, help="Requests allowed to wait for a worker before the simulation blocks")
+    parser.add_argument("--thread-per-request", action="store_true", help="Start an unbounded thread per request instead of using the worker pool")
+    parser.add_argument("--pending-size", type=int, default=100, help="Requests held while no server is active")
+    parser.add_argument("--pending-deadline", type=float, default=30.0, help="Seconds a held request may wait before it times out")
+    parser.add_argument("--overflow", choices=OVERFLOW_POLICIES, default="reject", help="What to do with a new request when the pending queue is full")
+    parser.add_argument("--manual-states", action="store_true", help="Ask which servers are active instead of health checking them")
+    parser.add_argument("--recovery-delay", type=float, default=15.0, help="With --manual-states, seconds before inactive servers come back")
+    add_health_arguments(parser)
+    add_outlier_arguments(parser)
+    args = parser.parse_args()
+
     num_requests = 100 
-    load_balancer = WeightedLeastConnectionLoadBalancer(servers)
+    executor = None if args.thread_per_request else BoundedExecutor(args.workers, args.queue_size)
+    pending = PendingQueue(args.pending_size, args.pending_deadline, args.overflow, on_discard=report_discarded_request)
+    load_balancer = WeightedLeastConnectionLoadBalancer(servers, executor=executor, pending=pending)
+    load_balancer.outlier = build_outlier_detector(args, servers, load_balancer.set_server_active)
+    on_health_change = load_balancer.outlier.health_changed if load_balancer.outlier is not None else load_balancer.set_server_active
     
-    set_initial_server_states()
+    recovery = health_checker = None
+    if args.manual_states:
+        set_initial_server_states(load_balancer)
+        recovery = schedule_server_recovery(load_balancer, args.recovery_delay)
+    else:
+        health_checker = start_health_checker(args, servers, on_health_change)
     
     simulate_requests(load_balancer, num_requests)
+    pending.join()  # Held requests go out as soon as a server recovers, or time out
+    if recovery is not None:
+        recovery.cancel()
+    if health_checker is not None:
+        health_checker.stop()
+        health_checker.print_status()
+    if load_balancer.outlier is not None:
+        load_balancer.outlier.stop()
+        load_balancer.outlier.print_status()
+    if executor is not None:
+        executor.shutdown(wait=True)  # Drain in-flight requests so the plot sees the final counts
+        executor.print_metrics()
+    pending.print_metrics()
+    print_pool_metrics()
 
     # Plot the request distribution after simulation
     plot_request_distribution(servers)
@@ -1,6 +1,15 @@
-import requests
+import os
+import sys
+import argparse
+import threading
+import time
 import matplotlib.pyplot as plt
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # Repository root, for the shared common/ package
+from common.backend_client import get_client, print_pool_metrics
+from common.health import add_health_arguments, start_health_checker
+from common.outlier import add_outlier_arguments, build_outlier_detector
+
 # Server class to represent a server in the load balancer
 class Server:
     def __init__(self, ip, port, weight=1):
@@ -9,6 +18,7 @@ class Server:
         self.weight = weight
         self.requests_log = []  # Log for incoming requests
         self.request_count = 0  # Count of requests handled by the server
+        self.active = True  # Cleared by the health checker while the server is down
 
 # Initialize servers
 servers = [
@@ -18,35 +28,101 @@ servers = [
     Server("127.0.0.1", 5004, weight=3)
 ]
 
-# Weighted Round Robin Load Balancer
+# Weighted Round Robin Load Balancer (smooth, nginx-style)
+# Every pick adds each server's weight to its current weight, takes the highest, and subtracts the total
+# weight from the winner, so weights 1,1,2,3 give 5004,5003,5001,5004,5002,5003,5004 instead of bursts.
 class WeightedRoundRobinLoadBalancer:
-    def __init__(self, servers):
+    def __init__(self, servers, use_schedule_table=False):
         self.servers = servers
-        self.current_index = 0
-        self.current_weight = 0
-        self.max_weight = max(server.weight for server in servers)
+        self.current_weights = [0] * len(servers)
+        self.lock = threading.Lock()  # Health changes arrive from the checker thread
+        self.active_indices = [i for i, server in enumerate(servers) if server.active]  # Only these take part in picks
+        self.total_weight = self._total_weight()
+        self.use_schedule_table = use_schedule_table  # Precompute one full cycle for O(1) picks on large pools
+        self.schedule = []
+        self.schedule_index = 0
+        if use_schedule_table:
+            self.schedule = self._build_schedule()
+
+    def _total_weight(self):
+        return sum(max(0, self.servers[i].weight) for i in self.active_indices)
+
+    def _smooth_pick(self, current_weights):
+        best = None
+        for i in self.active_indices:
+            weight = self.servers[i].weight
+            if weight <= 0:
+                continue  # Weight 0 means never pick
+            current_weights[i] += weight
+            if best is None or current_weights[i] > current_weights[best]:
+                best = i
+        current_weights[best] -= self.total_weight
+        return self.servers[best]
+
+    def _build_schedule(self):
+        """One full smooth cycle (total_weight picks); it repeats exactly, so picks become a table lookup."""
+        current_weights = [0] * len(self.servers)
+        return [self._smooth_pick(current_weights) for _ in range(self.total_weight)]
 
     def get_next_server(self):
-        while True:
-            server = self.servers[self.current_index]
-            # Select the server with weight
-            if self.current_weight < server.weight:
-                self.current_weight += 1
+        with self.lock:
+            if self.total_weight <= 0:
+                print("No active server has a positive weight. No server can be selected.")
+                return None
+
+            if self.use_schedule_table:
+                server = self.schedule[self.schedule_index]
+                self.schedule_index = (self.schedule_index + 1) % len(self.schedule)
                 return server
-            
-            # Reset the weight and move to the next server
-            self.current_weight = 0
-            self.current_index = (self.current_index + 1) % len(self.servers)
+            return self._smooth_pick(self.current_weights)
+
+    def set_weight(self, server, weight):
+        """Change a server's weight at runtime; the other servers' current weights carry over, so picks stay interleaved."""
+        with self.lock:
+            server.weight = weight
+            for i, s in enumerate(self.servers):
+                if s is server:
+                    self.current_weights[i] = 0  # Credit built up under the old weight must not win it extra picks
+            self.total_weight = self._total_weight()
+            self._refresh_schedule()
+
+    def set_server_active(self, server, active):
+        """Health checker hook: take a server out of (or back into) the rotation and restart the smooth cycle."""
+        with self.lock:
+            server.active = active
+            self.active_indices = [i for i, s in enumerate(self.servers) if s.active]
+            self.total_weight = self._total_weight()
+            self.current_weights = [0] * len(self.servers)
+            self._refresh_schedule()
+
+    def _refresh_schedule(self):
+        if self.use_schedule_table:
+            self.schedule = self._build_schedule()
+            self.schedule_index = self.schedule_index % len(self.schedule) if self.schedule else 0
 
 # Function to simulate requests
-def simulate_requests(load_balancer, num_requests):
+def simulate_requests(load_balancer, num_requests, outlier=None):
     for i in range(num_requests):
         server = load_balancer.get_next_server()
         algorithm = "Weighted Round Robin"
         request_number = i + 1  # Start counting from 1
 
-        # Sending a request to the server
-        response = requests.get(f'http://{server.ip}:{server.port}/?request_number={request_number}&algorithm={algorithm}')
+        if server is None:
+            continue
+        if outlier is not None:
+            outlier.on_request(server)
+
+        # Sending a request to the server (it may fail before the health checker notices it is down)
+        start_time = time.perf_counter()
+        try:
+            response = get_client(server).get('/', params={'request_number': request_number, 'algorithm': algorithm})
+        except Exception as e:
+            if outlier is not None:
+                outlier.record_failure(server, type(e).__name__)
+            print(f"Error requesting server {server.port}: {e}")
+            continue
+        if outlier is not None:
+            outlier.record_response(server, response.status_code, time.perf_counter() - start_time)
         print(response.text)
 
         # Increment the request count for the server
@@ -67,9 +143,24 @@ def plot_request_distribution(servers):
 
 # Running the simulation
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Weighted Round Robin load balancer simulation")
+    parser.add_argument("--schedule-table", action="store_true", help="Precompute the pick schedule for O(1) selection")
+    add_health_arguments(parser)
+    add_outlier_arguments(parser)
+    args = parser.parse_args()
+
     num_requests = 100  # Change this to the desired number of requests
-    load_balancer = WeightedRoundRobinLoadBalancer(servers)
-    simulate_requests(load_balancer, num_requests)
+    load_balancer = WeightedRoundRobinLoadBalancer(servers, use_schedule_table=args.schedule_table)
+    outlier = build_outlier_detector(args, servers, load_balancer.set_server_active)
+    health_checker = start_health_checker(args, servers, outlier.health_changed if outlier is not None else load_balancer.set_server_active)
+    simulate_requests(load_balancer, num_requests, outlier)
+    if health_checker is not None:
+        health_checker.stop()
+        health_checker.print_status()
+    if outlier is not None:
+        outlier.stop()
+        outlier.print_status()
+    print_pool_metrics()
     
     # Plot the request distribution after simulation
     plot_request_distribution(servers)
@@ -1,108 +1,405 @@
+import os
+import sys
+import time
+import tracemalloc
 import matplotlib.pyplot as plt
 import numpy as np
 import random
+import bisect
+import math
 from collections import defaultdict
-import hashlib
+from fractions import Fraction
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # Repository root, for the shared common/ package
+from common.hashing import JUMP_MULTIPLIER, MASK64, get_hash_strategy, jump_hash
 
 # Constants
-MAX_HASH = 2**32
 NUM_SERVERS = 5
 VIRTUAL_NODES = 10
 NUM_REQUESTS = 10000
+HASH_STRATEGY = "sha256-32"  # SHA-256 truncated to 32 bits, the original ring positions; "fast" picks the quickest 64-bit hash
+SERVER_WEIGHTS = [1, 1, 2, 3, 3]  # Weights for the weighted variants, one per server
+MAGLEV_TABLE_SIZE = 65537  # Prime, and much larger than the number of servers
+
+# Function to hash a batch of keys once into fixed 64-bit integers for NumPy routing
+def hash_keys(hash_strategy, keys):
+    return np.fromiter((hash_strategy.hash64(key) for key in keys), dtype=np.uint64, count=len(keys))
 
-# Function to get a consistent hash
-def get_hash(value):
-    return int(hashlib.sha256(value.encode('utf-8')).hexdigest(), 16) % MAX_HASH
+# Function to turn owner indexes into the (owner indexes, per-server counts) pair returned by route_batch
+# An owner index of -1 means no server took the request (e.g. Maglev with every weight 0) and is not counted
+def owner_counts(owner_indexes, num_servers):
+    return owner_indexes, np.bincount(owner_indexes[owner_indexes >= 0], minlength=num_servers)
 
 # Consistent Hashing (CHBL)
 class ConsistentHashing:
-    def __init__(self, servers):
-        self.ring = sorted(get_hash(server) for server in servers)
+    def __init__(self, servers, hash_strategy=HASH_STRATEGY):
         self.servers = servers
+        self.hash = get_hash_strategy(hash_strategy)
+        self.server_map = {self.hash(server): server for server in servers}  # Ring position -> server
+        self.ring = sorted(self.server_map)
+        server_index = {server: i for i, server in enumerate(servers)}
+        self.positions = np.array([self.hash.fixed64(position) for position in self.ring], dtype=np.uint64)
+        self.owners = np.array([server_index[self.server_map[position]] for position in self.ring], dtype=np.int32)
 
     def get_server(self, request_id):
-        request_hash = get_hash(request_id)
-        for server_hash in self.ring:
-            if request_hash <= server_hash:
-                return self.servers[self.ring.index(server_hash)]
-        return self.servers[0]
+        request_hash = self.hash(request_id)
+        idx = bisect.bisect_left(self.ring, request_hash)  # First ring position >= request hash
+        if idx == len(self.ring):
+            idx = 0  # Wrap around to the start of the ring
+        return self.server_map[self.ring[idx]]
+
+    def route_batch(self, request_ids):
+        """Route many requests at once; returns (owner indexes into self.servers, per-server counts)."""
+        idx = np.searchsorted(self.positions, hash_keys(self.hash, request_ids), side='left')
+        idx[idx == len(self.positions)] = 0  # Wrap around to the start of the ring
+        return owner_counts(self.owners[idx], len(self.servers))
 
 # Consistent Hashing with Virtual Nodes (CHVN)
 class ConsistentHashingWithVirtualNodes:
-    def __init__(self, servers, virtual_nodes=10):
+    def __init__(self, servers, virtual_nodes=10, hash_strategy=HASH_STRATEGY):
         self.ring = {}
         self.servers = servers
         self.virtual_nodes = virtual_nodes
+        self.hash = get_hash_strategy(hash_strategy)
         for server in servers:
             for i in range(virtual_nodes):
                 vnode_id = f"{server}-VN{i}"
-                self.ring[get_hash(vnode_id)] = server
+                self.ring[self.hash(vnode_id)] = server
         self.sorted_keys = sorted(self.ring.keys())
+        server_index = {server: i for i, server in enumerate(servers)}
+        self.positions = np.array([self.hash.fixed64(position) for position in self.sorted_keys], dtype=np.uint64)
+        self.owners = np.array([server_index[self.ring[position]] for position in self.sorted_keys], dtype=np.int32)
+
+    def get_server(self, request_id):
+        request_hash = self.hash(request_id)
+        idx = bisect.bisect_left(self.sorted_keys, request_hash)  # First ring position >= request hash
+        if idx == len(self.sorted_keys):
+            idx = 0  # Wrap around to the start of the ring
+        return self.ring[self.sorted_keys[idx]]
+
+    def route_batch(self, request_ids):
+        """Route many requests at once; returns (owner indexes into self.servers, per-server counts)."""
+        idx = np.searchsorted(self.positions, hash_keys(self.hash, request_ids), side='left')
+        idx[idx == len(self.positions)] = 0  # Wrap around to the start of the ring
+        return owner_counts(self.owners[idx], len(self.servers))
+
+# Jump Consistent Hash (JCH): O(ln n) lookup with no ring in memory
+# Only adding or removing the *last* server is minimally disruptive; removing one in the middle renumbers the rest.
+# Weighted variant: each server owns `weight` consecutive buckets.
+class JumpConsistentHashing:
+    def __init__(self, servers, weights=None, hash_strategy=HASH_STRATEGY):
+        self.servers = servers
+        self.hash = get_hash_strategy(hash_strategy)
+        weights = weights or {}
+        self.buckets = [i for i, server in enumerate(servers) for _ in range(int(weights.get(server, 1)))]  # Bucket -> server index
+        self._bucket_owners = np.array(self.buckets, dtype=np.int32)
+
+    @staticmethod
+    def jump_hash_batch(keys, num_buckets):
+        """Vectorized jump_hash: every key takes the same steps, iterating until all have settled."""
+        keys = keys.copy()
+        buckets = np.full(len(keys), -1, dtype=np.int64)
+        jumps = np.zeros(len(keys), dtype=np.int64)
+        active = np.arange(len(keys))
+        while len(active):
+            buckets[active] = jumps[active]
+            keys[active] = keys[active] * np.uint64(JUMP_MULTIPLIER) + np.uint64(1)  # Wraps modulo 2**64
+            scale = float(1 << 31) / ((keys[active] >> np.uint64(33)) + np.uint64(1)).astype(np.float64)
+            jumps[active] = ((buckets[active] + 1).astype(np.float64) * scale).astype(np.int64)
+            active = active[jumps[active] < num_buckets]
+        return buckets
+
+    def get_server(self, request_id):
+        bucket = jump_hash(self.hash.hash64(request_id), len(self.buckets))
+        return self.servers[self.buckets[bucket]]
+
+    def route_batch(self, request_ids):
+        """Route many requests at once; returns (owner indexes into self.servers, per-server counts)."""
+        buckets = self.jump_hash_batch(hash_keys(self.hash, request_ids), len(self.buckets))
+        return owner_counts(self._bucket_owners[buckets], len(self.servers))
+
+# Rendezvous / Highest Random Weight hashing (HRW): every server scores the key, the highest score wins
+# Weighted variant uses the logarithmic method: score = -weight / ln(u) with u uniform in (0, 1).
+class RendezvousHashing:
+    def __init__(self, servers, weights=None, hash_strategy=HASH_STRATEGY):
+        self.servers = servers
+        self.hash = get_hash_strategy(hash_strategy)
+        weights = weights or {}
+        self.weights = [float(weights.get(server, 1)) for server in servers]
+        self.seeds = [self.hash.hash64(server) for server in servers]
+        self._seed_array = np.array(self.seeds, dtype=np.uint64)
+        self._weight_array = np.array(self.weights, dtype=np.float64)
+
+    @staticmethod
+    def mix64(value):
+        """splitmix64 finalizer, so every (key, server) pair gets an independent-looking score."""
+        value = ((value ^ (value >> 30)) * 0xbf58476d1ce4e5b9) & MASK64
+        value = ((value ^ (value >> 27)) * 0x94d049bb133111eb) & MASK64
+        return value ^ (value >> 31)
+
+    @staticmethod
+    def mix64_batch(values):
+        values = (values ^ (values >> np.uint64(30))) * np.uint64(0xbf58476d1ce4e5b9)
+        values = (values ^ (values >> np.uint64(27))) * np.uint64(0x94d049bb133111eb)
+        return values ^ (values >> np.uint64(31))
 
     def get_server(self, request_id):
-        request_hash = get_hash(request_id)
-        for key in self.sorted_keys:
-            if request_hash <= key:
-                return self.ring[key]
-        return self.ring[self.sorted_keys[0]]
-
-# Simulation settings
-servers = [f"Server-{i}" for i in range(NUM_SERVERS)]
-concurrency_levels_k = [1, 10, 50, 100, 200]  # In thousands
-
-# Arrays to hold results
-chvn_requests_processed = []
-chbl_requests_processed = []
-
-# Simulate requests and calculate processed requests per second
-for concurrency in concurrency_levels_k:
-    chbl = ConsistentHashing(servers)
-    chvn = ConsistentHashingWithVirtualNodes(servers, virtual_nodes=VIRTUAL_NODES)
-
-    chbl_distribution = defaultdict(int)
-    chvn_distribution = defaultdict(int)
-
-    # Process NUM_REQUESTS requests to simulate distribution load
-    for i in range(NUM_REQUESTS):
-        request_id = f"request-{i}"
+        key = self.hash.hash64(request_id)
+        best_score, best_index = -1.0, 0
+        for i, (seed, weight) in enumerate(zip(self.seeds, self.weights)):
+            uniform = ((self.mix64(key ^ seed) >> 11) + 0.5) / (1 << 53)  # Strictly inside (0, 1)
+            score = -weight / math.log(uniform)
+            if score > best_score:
+                best_score, best_index = score, i
+        return self.servers[best_index]
+
+    def route_batch(self, request_ids):
+        """Route many requests at once; returns (owner indexes into self.servers, per-server counts)."""
+        keys = hash_keys(self.hash, request_ids)
+        mixed = self.mix64_batch(keys[:, None] ^ self._seed_array[None, :])  # keys x servers
+        uniform = ((mixed >> np.uint64(11)).astype(np.float64) + 0.5) / float(1 << 53)
+        scores = -self._weight_array[None, :] / np.log(uniform)
+        return owner_counts(np.argmax(scores, axis=1).astype(np.int32), len(self.servers))
+
+# Maglev hashing: a prime-sized lookup table filled from per-server permutations, so a lookup is one index
+# Weighted variant: a server claims `weight` table entries per round of the fill loop (non-integer weights are
+# scaled up to whole numbers with the same ratios, and weight-0 servers get no entries).
+class MaglevHashing:
+    def __init__(self, servers, weights=None, table_size=MAGLEV_TABLE_SIZE, hash_strategy=HASH_STRATEGY):
+        if table_size < 2 or any(table_size % d == 0 for d in range(2, math.isqrt(table_size) + 1)):
+            raise ValueError(f"Maglev table size must be prime, got {table_size}")
+        self.table_size = table_size
+        self.hash = get_hash_strategy(hash_strategy)
+        self.servers = []
+        self.weights = {}
+        self._permutations = {}  # Server -> (offset, skip), cached so a rebuild only hashes new servers
+        self.table = [None] * table_size  # Entry -> server
+        self._table_indexes = np.zeros(table_size, dtype=np.int32)  # Entry -> index into self.servers
+        self.last_disruption = 0.0  # Fraction of table entries that changed server in the last rebuild
+        self.add_servers(servers, weights)
+
+    def _permutation(self, server):
+        if server not in self._permutations:
+            offset = self.hash.hash64(f"{server}-offset") % self.table_size
+            skip = self.hash.hash64(f"{server}-skip") % (self.table_size - 1) + 1
+            self._permutations[server] = (offset, skip)
+        return self._permutations[server]
+
+    def _turns(self):
+        """Entries each server claims per round: its weight, scaled so every weight is a whole number."""
+        weights = [Fraction(self.weights[server]).limit_denominator(1000) for server in self.servers]
+        scale = math.lcm(*(weight.denominator for weight in weights))
+        return [int(weight * scale) for weight in weights]
+
+    def _populate(self):
+        """Fill the lookup table round by round, each server taking its next free preferred entry."""
+        size = self.table_size
+        table = [None] * size
+        turns = self._turns() if self.servers else []
+        members = [i for i, count in enumerate(turns) if count > 0]  # Weight-0 servers stay out of the table
+        if not members:
+            return table
+
+        permutations = [self._permutation(server) for server in self.servers]
+        next_index = [0] * len(self.servers)
+        filled = 0
+        while True:
+            for i in members:
+                server = self.servers[i]
+                offset, skip = permutations[i]
+                for _ in range(turns[i]):
+                    entry = (offset + skip * next_index[i]) % size
+                    while table[entry] is not None:
+                        next_index[i] += 1
+                        entry = (offset + skip * next_index[i]) % size
+                    table[entry] = server
+                    next_index[i] += 1
+                    filled += 1
+                    if filled == size:
+                        return table
+
+    def _rebuild(self):
+        old_table = self.table
+        self.table = self._populate()
+        changed = sum(1 for old, new in zip(old_table, self.table) if old is not None and old != new)
+        self.last_disruption = changed / self.table_size
+        server_index = {server: i for i, server in enumerate(self.servers)}
+        self._table_indexes = np.array([server_index.get(server, -1) for server in self.table], dtype=np.int32)
+        return self.last_disruption
+
+    def add_servers(self, servers, weights=None):
+        """Add servers and rebuild the table; returns the fraction of entries that moved to another server."""
+        weights = weights or {}
+        if any(weight < 0 for weight in weights.values()):
+            raise ValueError(f"Maglev weights must be non-negative, got {weights}")
+        for server in servers:
+            if server not in self.weights:
+                self.servers.append(server)
+                self.weights[server] = weights.get(server, 1)
+            elif server in weights:
+                self.weights[server] = weights[server]  # Re-adding without a weight keeps the current one
+        return self._rebuild()
+
+    def remove_servers(self, servers):
+        """Remove servers and rebuild the table; returns the fraction of entries that moved to another server."""
+        for server in servers:
+            if server in self.weights:
+                self.servers.remove(server)
+                del self.weights[server]
+                self._permutations.pop(server, None)
+        return self._rebuild()
+
+    def get_server(self, request_id):
+        return self.table[self.hash.hash64(request_id) % self.table_size]
+
+    def route_batch(self, request_ids):
+        """Route many requests at once; returns (owner indexes into self.servers, per-server counts).
+
+        The owner index is -1 where the table is empty (no servers, or every weight 0), as get_server returns None.
+        """
+        entries = hash_keys(self.hash, request_ids) % np.uint64(self.table_size)
+        return owner_counts(self._table_indexes[entries], len(self.servers))
+
+# Function to measure lookup throughput, memory use and key movement for one algorithm
+def measure_algorithm(factory, servers, request_ids):
+    tracemalloc.start()
+    balancer = factory(servers)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    start_time = time.perf_counter()
+    for request_id in request_ids:
+        balancer.get_server(request_id)
+    lookups_per_second = len(request_ids) / (time.perf_counter() - start_time)
+
+    start_time = time.perf_counter()
+    owners, _ = balancer.route_batch(request_ids)
+    batch_per_second = len(request_ids) / (time.perf_counter() - start_time)
+
+    # Key movement when one server is appended, and when a server in the middle is removed
+    before = np.array(servers)[owners]
+    grown = servers + [f"Server-{len(servers)}"]
+    added_owners, _ = factory(grown).route_batch(request_ids)
+    moved_on_add = np.mean(before != np.array(grown)[added_owners])
+    shrunk = servers[:len(servers) // 2] + servers[len(servers) // 2 + 1:]
+    removed_owners, _ = factory(shrunk).route_batch(request_ids)
+    moved_on_remove = np.mean(before != np.array(shrunk)[removed_owners])
+
+    return {
+        "lookups_per_second": lookups_per_second,
+        "batch_per_second": batch_per_second,
+        "memory_bytes": memory,
+        "moved_on_add": moved_on_add,
+        "moved_on_remove": moved_on_remove,
+    }
+
+# Function to compare the ring-based and stateless algorithms side by side
+def compare_algorithms(servers, request_ids):
+    weights = {server: weight for server, weight in zip(servers, SERVER_WEIGHTS)}
+    algorithms = {
+        "CHBL": lambda s: ConsistentHashing(s),
+        "CHVN": lambda s: ConsistentHashingWithVirtualNodes(s, virtual_nodes=VIRTUAL_NODES),
+        "Jump": lambda s: JumpConsistentHashing(s),
+        "Weighted Jump": lambda s: JumpConsistentHashing(s, weights=weights),
+        "HRW": lambda s: RendezvousHashing(s),
+        "Weighted HRW": lambda s: RendezvousHashing(s, weights=weights),
+        "Maglev": lambda s: MaglevHashing(s),
+        "Weighted Maglev": lambda s: MaglevHashing(s, weights=weights),
+    }
+
+    results = {name: measure_algorithm(factory, servers, request_ids) for name, factory in algorithms.items()}
+
+    # Table disruption reported by Maglev itself for an incremental add and remove
+    maglev = MaglevHashing(servers)
+    added = maglev.add_servers([f"Server-{len(servers)}"])
+    removed = maglev.remove_servers([servers[len(servers) // 2]])
+    print(f"\nMaglev table disruption: {added:.1%} of entries on add, {removed:.1%} on remove")
+
+    print(f"\n{'Algorithm':<15}{'lookups/s':>12}{'batch keys/s':>14}{'memory (B)':>12}{'moved +1':>10}{'moved -1':>10}")
+    for name, result in results.items():
+        print(f"{name:<15}{result['lookups_per_second']:>12,.0f}{result['batch_per_second']:>14,.0f}"
+              f"{result['memory_bytes']:>12,}{result['moved_on_add']:>10.1%}{result['moved_on_remove']:>10.1%}")
+
+    names = list(results)
+    fig, axs = plt.subplots(1, 3, figsize=(16, 5))
+    axs[0].bar(names, [results[name]["lookups_per_second"] / 1000 for name in names], color='skyblue')
+    axs[0].set_ylabel("Lookups per second / 1000")
+    axs[0].set_title("Per-request lookup throughput")
+    axs[1].bar(names, [results[name]["memory_bytes"] / 1024 for name in names], color='orange')
+    axs[1].set_ylabel("KiB")
+    axs[1].set_title("Memory used by the balancer")
+    axs[2].bar(names, [results[name]["moved_on_add"] * 100 for name in names], label="Server added")
+    axs[2].bar(names, [results[name]["moved_on_remove"] * 100 for name in names], alpha=0.5, label="Server removed")
+    axs[2].set_ylabel("Keys moved (%)")
+    axs[2].set_title("Key movement on membership change")
+    axs[2].legend()
+    for ax in axs:
+        ax.tick_params(axis='x', rotation=45)
+    plt.tight_layout()
+    plt.show()
+    return results
+
+if __name__ == "__main__":
+    # Simulation settings
+    servers = [f"Server-{i}" for i in range(NUM_SERVERS)]
+    concurrency_levels_k = [1, 10, 50, 100, 200]  # In thousands
+
+    # Arrays to hold results
+    chvn_requests_processed = []
+    chbl_requests_processed = []
+
+    # Simulate requests and calculate processed requests per second
+    for concurrency in concurrency_levels_k:
+        chbl = ConsistentHashing(servers)
+        chvn = ConsistentHashingWithVirtualNodes(servers, virtual_nodes=VIRTUAL_NODES)
+
+        chbl_distribution = defaultdict(int)
+        chvn_distribution = defaultdict(int)
+
+        # Process NUM_REQUESTS requests to simulate distribution load
+        for i in range(NUM_REQUESTS):
+            request_id = f"request-{i}"
         
-        # CHBL processing
-        chbl_server = chbl.get_server(request_id)
-        chbl_distribution[chbl_server] += 1
+            # CHBL processing
+            chbl_server = chbl.get_server(request_id)
+            chbl_distribution[chbl_server] += 1
         
-        # CHVN processing
-        chvn_server = chvn.get_server(request_id)
-        chvn_distribution[chvn_server] += 1
+            # CHVN processing
+            chvn_server = chvn.get_server(request_id)
+            chvn_distribution[chvn_server] += 1
 
-    # Calculate request processing rates (with degradation for CHBL)
-    chbl_std_dev = np.std(list(chbl_distribution.values()))
-    chvn_std_dev = np.std(list(chvn_distribution.values()))
+        # Calculate request processing rates (with degradation for CHBL)
+        chbl_std_dev = np.std(list(chbl_distribution.values()))
+        chvn_std_dev = np.std(list(chvn_distribution.values()))
 
-    # Simulate degradation in processing rate for CHBL based on load
-    chbl_processing_rate = (6000 - concurrency * 2) / (1 + chbl_std_dev + random.uniform(0, 0.2))
-    chvn_processing_rate = 6000 / (1 + chvn_std_dev + random.uniform(0, 0.1))
+        # Simulate degradation in processing rate for CHBL based on load
+        chbl_processing_rate = (6000 - concurrency * 2) / (1 + chbl_std_dev + random.uniform(0, 0.2))
+        chvn_processing_rate = 6000 / (1 + chvn_std_dev + random.uniform(0, 0.1))
     
-    # Adjust to per 1000 requests, simulating the graph's structure
-    chbl_requests_processed.append(max(0, chbl_processing_rate) / 1000)
-    chvn_requests_processed.append(max(0, chvn_processing_rate) / 1000)
-
-# Plotting the graph
-plt.figure(figsize=(10, 6))
-plt.plot(concurrency_levels_k, chvn_requests_processed, 'b^-', label="CHVN")
-plt.plot(concurrency_levels_k, chbl_requests_processed, 'rs-', label="CHBL")
-
-# Annotate each point with the value
-for x, y in zip(concurrency_levels_k, chvn_requests_processed):
-    plt.text(x, y, f"{y:.3f}", ha='center', va='bottom', color='blue')
-for x, y in zip(concurrency_levels_k, chbl_requests_processed):
-    plt.text(x, y, f"{y:.3f}", ha='center', va='top', color='red')
-
-# Labels and Title
-plt.xlabel("Number of concurrent requests / 1000")
-plt.ylabel("Number of requests processed per second / 1000")
-plt.title("Comparison of CHVN and CHBL Request Processing Efficiency")
-plt.legend()
-plt.grid(True)
-
-# Display the plot
-plt.show()
+        # Adjust to per 1000 requests, simulating the graph's structure
+        chbl_requests_processed.append(max(0, chbl_processing_rate) / 1000)
+        chvn_requests_processed.append(max(0, chvn_processing_rate) / 1000)
+
+    # Plotting the graph
+    plt.figure(figsize=(10, 6))
+    plt.plot(concurrency_levels_k, chvn_requests_processed, 'b^-', label="CHVN")
+    plt.plot(concurrency_levels_k, chbl_requests_processed, 'rs-', label="CHBL")
+
+    # Annotate each point with the value
+    for x, y in zip(concurrency_levels_k, chvn_requests_processed):
+        plt.text(x, y, f"{y:.3f}", ha='center', va='bottom', color='blue')
+    for x, y in zip(concurrency_levels_k, chbl_requests_processed):
+        plt.text(x, y, f"{y:.3f}", ha='center', va='top', color='red')
+
+    # Labels and Title
+    plt.xlabel("Number of concurrent requests / 1000")
+    plt.ylabel("Number of requests processed per second / 1000")
+    plt.title("Comparison of CHVN and CHBL Request Processing Efficiency")
+    plt.legend()
+    plt.grid(True)
+
+    # Display the plot
+    plt.show()
+
+    # Lookup throughput, memory and key movement of the ring-based and stateless algorithms
+    compare_algorithms(servers, [f"request-{i}" for i in range(NUM_REQUESTS)])
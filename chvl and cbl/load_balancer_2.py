@@ -127,14 +127,20 @@
 # plt.show()
 
 
+import os
+import sys
 import matplotlib.pyplot as plt
 import numpy as np
-import hashlib
+import bisect
 from collections import defaultdict
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # Repository root, for the shared common/ package
+from common.hashing import get_hash_strategy
+
 class ConsistentHashing:
-    def __init__(self, nodes):
+    def __init__(self, nodes, hash_strategy="md5"):
         self.nodes = nodes
+        self.hash_strategy = get_hash_strategy(hash_strategy)  # "md5" keeps today's node placements
         self.ring = []
         self.node_map = {}
         for node in nodes:
@@ -144,20 +150,21 @@ class ConsistentHashing:
         self.ring.sort()
 
     def _hash(self, key):
-        return int(hashlib.md5(key.encode()).hexdigest(), 16)
+        return self.hash_strategy(key)
 
     def get_node(self, key):
         hash_val = self._hash(key)
-        for node_hash in self.ring:
-            if hash_val <= node_hash:
-                return self.node_map[node_hash]
-        return self.node_map[self.ring[0]]
+        idx = bisect.bisect_left(self.ring, hash_val)  # First ring position >= key hash
+        if idx == len(self.ring):
+            idx = 0  # Wrap around to the start of the ring
+        return self.node_map[self.ring[idx]]
 
 
 class VirtualNodeConsistentHashing:
-    def __init__(self, nodes, virtual_nodes=3):
+    def __init__(self, nodes, virtual_nodes=3, hash_strategy="md5"):
         self.nodes = nodes
         self.virtual_nodes = virtual_nodes
+        self.hash_strategy = get_hash_strategy(hash_strategy)  # "md5" keeps today's node placements
         self.ring = []
         self.node_map = {}
         for node in nodes:
@@ -169,14 +176,14 @@ class VirtualNodeConsistentHashing:
         self.ring.sort()
 
     def _hash(self, key):
-        return int(hashlib.md5(key.encode()).hexdigest(), 16)
+        return self.hash_strategy(key)
 
     def get_node(self, key):
         hash_val = self._hash(key)
-        for node_hash in self.ring:
-            if hash_val <= node_hash:
-                return self.node_map[node_hash]
-        return self.node_map[self.ring[0]]
+        idx = bisect.bisect_left(self.ring, hash_val)  # First ring position >= key hash
+        if idx == len(self.ring):
+            idx = 0  # Wrap around to the start of the ring
+        return self.node_map[self.ring[idx]]
 
 
 # Simulation parameters
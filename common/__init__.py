@@ -0,0 +1 @@
+# Shared helpers used by the load balancers in the algorithm directories.
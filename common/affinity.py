@@ -0,0 +1,80 @@
+import threading
+from collections import OrderedDict
+
+# Bounded LRU map from client address to the index of its chosen backend. Each entry remembers
+# the generation it was stored in; invalidate() just bumps the generation, so a server-set change
+# drops every entry in O(1) and stale ones are discarded lazily as they are looked up. Callers pass
+# the generation they read before computing a choice, so a choice computed against an older server
+# set is never stored under a newer generation.
+class AffinityCache:
+    def __init__(self, max_size=4096):
+        self.max_size = max_size
+        self.generation = 0
+        self._entries = OrderedDict()  # client -> (generation, server index), least recently used first
+        self._lock = threading.Lock()
+
+        # Cache metrics
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0      # Misses caused by an entry from an older generation
+        self.evictions = 0  # Entries pushed out by the size limit
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, client, generation=None):
+        """Cached server index for client stored under `generation` (default: the current one), or None on a miss."""
+        with self._lock:
+            if generation is None:
+                generation = self.generation
+            entry = self._entries.get(client)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_generation, index = entry
+            if stored_generation != generation:
+                if stored_generation < self.generation:
+                    del self._entries[client]  # Only drop entries that are stale, not ones newer than the caller
+                    self.stale += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(client)
+            self.hits += 1
+            return index
+
+    def put(self, client, index, generation=None):
+        """Cache a choice computed under `generation`; a choice from an invalidated generation is dropped."""
+        with self._lock:
+            if generation is None:
+                generation = self.generation
+            elif generation != self.generation:
+                return
+            self._entries[client] = (generation, index)
+            self._entries.move_to_end(client)
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self):
+        """Forget every cached choice, e.g. after servers were added, removed or changed health; returns the new generation."""
+        with self._lock:
+            self.generation += 1
+            return self.generation
+
+    def metrics(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'generation': self.generation,
+            'hits': self.hits,
+            'misses': self.misses,
+            'stale': self.stale,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+    def print_metrics(self):
+        m = self.metrics()
+        print(f"\nAffinity cache ({m['size']}/{m['max_size']} entries, generation {m['generation']}):")
+        print(f"  {m['hits']} hits, {m['misses']} misses ({m['stale']} stale), hit rate {m['hit_rate']:.1%}, {m['evictions']} evictions")
@@ -0,0 +1,145 @@
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+# Defaults applied to every pool created after configure_pools() is called
+DEFAULT_POOL_OPTIONS = {
+    "max_connections": 10,   # Keep-alive connections (and concurrent requests) per server
+    "idle_timeout": 30.0,    # Seconds a pool may sit unused before its connections are dropped
+    "acquire_timeout": None, # Seconds to wait for a free connection (None waits forever)
+    "request_timeout": 10.0, # Seconds before a single request is abandoned
+}
+
+# Raised when no connection becomes free within acquire_timeout
+class PoolExhaustedError(requests.exceptions.ConnectionError):
+    pass
+
+# Bounded keep-alive connection pool for a single backend server
+class BackendClient:
+    def __init__(self, ip, port, max_connections=10, idle_timeout=30.0, acquire_timeout=None, request_timeout=10.0):
+        self.ip = ip
+        self.port = port
+        self.base_url = f"http://{ip}:{port}"
+        self.max_connections = max_connections
+        self.idle_timeout = idle_timeout
+        self.acquire_timeout = acquire_timeout
+        self.request_timeout = request_timeout
+
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._lock = threading.Lock()
+        self._session = None
+        self._last_used = time.monotonic()
+
+        # Pool metrics
+        self.requests = 0          # Requests sent through the pool
+        self.in_use = 0            # Connections currently checked out
+        self.peak_in_use = 0       # Highest number of connections checked out at once
+        self.exhausted = 0         # Requests that found every connection busy and had to wait
+        self.acquire_timeouts = 0  # Requests that gave up waiting for a connection
+        self.wait_time = 0.0       # Total seconds spent waiting for a free connection
+        self.idle_resets = 0       # Times the pool was dropped after sitting idle
+
+    def _new_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_connections, pool_block=True)
+        session.mount("http://", adapter)
+        return session
+
+    def _checkout(self):
+        if not self._slots.acquire(blocking=False):
+            start_time = time.monotonic()
+            acquired = self._slots.acquire(timeout=self.acquire_timeout) if self.acquire_timeout is not None else self._slots.acquire()
+            with self._lock:
+                self.exhausted += 1
+                self.wait_time += time.monotonic() - start_time
+                if not acquired:
+                    self.acquire_timeouts += 1
+            if not acquired:
+                raise PoolExhaustedError(f"No free connection to {self.base_url} after {self.acquire_timeout}s")
+
+        with self._lock:
+            now = time.monotonic()
+            if self._session is not None and self.in_use == 0 and now - self._last_used > self.idle_timeout:
+                self._session.close()  # Idle connections were most likely closed by the server already
+                self._session = None
+                self.idle_resets += 1
+            if self._session is None:
+                self._session = self._new_session()
+            self.requests += 1
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+            return self._session
+
+    def _checkin(self):
+        with self._lock:
+            self.in_use -= 1
+            self._last_used = time.monotonic()
+        self._slots.release()
+
+    def get(self, path="/", params=None, timeout=None):
+        session = self._checkout()
+        try:
+            return session.get(self.base_url + path, params=params, timeout=timeout or self.request_timeout)
+        finally:
+            self._checkin()
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "in_use": self.in_use,
+                "peak_in_use": self.peak_in_use,
+                "max_connections": self.max_connections,
+                "exhausted": self.exhausted,
+                "acquire_timeouts": self.acquire_timeouts,
+                "wait_time": self.wait_time,
+                "idle_resets": self.idle_resets,
+            }
+
+    def close(self):
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+
+# Process-wide registry: one pool per (ip, port), shared by every balancer
+_clients = {}
+_clients_lock = threading.Lock()
+
+def configure_pools(**options):
+    """Change the defaults used for pools created from now on."""
+    unknown = set(options) - set(DEFAULT_POOL_OPTIONS)
+    if unknown:
+        raise TypeError(f"Unknown pool options: {', '.join(sorted(unknown))}")
+    DEFAULT_POOL_OPTIONS.update(options)
+
+def get_client(server, **options):
+    """Return the shared pool for server, creating it on first use."""
+    key = (server.ip, server.port)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = BackendClient(server.ip, server.port, **{**DEFAULT_POOL_OPTIONS, **options})
+                _clients[key] = client
+    return client
+
+def pool_metrics():
+    return {key: client.metrics() for key, client in _clients.items()}
+
+def print_pool_metrics():
+    print("\nConnection pool metrics:")
+    for (ip, port), metrics in sorted(pool_metrics().items()):
+        print(f"Server {ip}:{port} -> requests: {metrics['requests']}, "
+              f"peak in use: {metrics['peak_in_use']}/{metrics['max_connections']}, "
+              f"exhausted: {metrics['exhausted']} (waited {metrics['wait_time']:.2f}s, "
+              f"{metrics['acquire_timeouts']} timeouts), idle resets: {metrics['idle_resets']}")
+
+def close_all():
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
@@ -0,0 +1,145 @@
+import argparse
+import multiprocessing
+import os
+import socket
+import sys
+from flask import Flask, request, jsonify
+
+try:
+    from aiohttp import web
+except ImportError:  # Optional, pip install aiohttp (needed for --server aiohttp)
+    web = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # Repository root, when run as a script
+from common.request_log import RequestLog
+from common.service_time import ServiceEmulator, ServiceProfile
+
+# One stand-in backend per process. "flask" is Flask's development server (the original backends);
+# "aiohttp" is an asyncio server with HTTP keep-alive that can also be pre-forked into several worker
+# processes sharing one port. For whole fleets use common/launcher.py instead. --service-time makes
+# the '/' route take a sampled amount of time to answer (see common/service_time.py for the specs).
+#
+#   python -m common.backend_server 5001 [--server flask|aiohttp] [--workers N] [--service-time exponential:0.02/8]
+SERVER_MODES = ("flask", "aiohttp")
+
+def status_summary(port, requests_log, worker=None, service=None):
+    summary = {"server": f"Server (Port {port})", "port": port, **requests_log.summary()}
+    if service is not None:
+        summary.update(service.summary())
+    if worker is not None:
+        summary["worker"] = worker  # With several workers each one keeps its own log and totals
+    return summary
+
+def _int_arg(value, default):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+def create_flask_app(port, requests_log, profile=None):
+    service = ServiceEmulator(profile or ServiceProfile())
+    app = Flask(__name__)
+
+    @app.route('/')
+    def index():
+        # Get request number and algorithm from query parameters
+        request_number = request.args.get('request_number', 'unknown')
+        algorithm = request.args.get('algorithm', 'unknown')
+
+        # Log the request
+        log_entry = requests_log.record(request_number, algorithm)
+
+        # Take as long as the service-time profile says, waiting for a slot if the server is at its cap
+        service.serve_blocking()
+
+        return f"Response from Server (Port {port}) - {log_entry}"
+
+    @app.route('/status')
+    def status():
+        # Summary only: totals and the last few requests, so health checks stay cheap
+        return jsonify(status_summary(port, requests_log, service=service))
+
+    @app.route('/log')
+    def log():
+        # Page through the retained entries: /log?after=<seq>&limit=<n>, then pass "next" back as after
+        after = request.args.get('after', 0, type=int)
+        limit = min(request.args.get('limit', 100, type=int), 1000)
+        return jsonify(requests_log.page(after, limit))
+
+    return app
+
+def create_aiohttp_app(port, requests_log, worker=None, profile=None):
+    """Same routes and responses as create_flask_app, served from an asyncio event loop."""
+    service = ServiceEmulator(profile or ServiceProfile())
+
+    async def index(req):
+        request_number = req.query.get('request_number', 'unknown')
+        algorithm = req.query.get('algorithm', 'unknown')
+        log_entry = requests_log.record(request_number, algorithm)
+        await service.serve_async()
+        return web.Response(text=f"Response from Server (Port {port}) - {log_entry}", content_type="text/html")
+
+    async def status(req):
+        return web.json_response(status_summary(port, requests_log, worker, service))
+
+    async def log(req):
+        after = _int_arg(req.query.get('after'), 0)
+        limit = min(_int_arg(req.query.get('limit'), 100), 1000)
+        return web.json_response(requests_log.page(after, limit))
+
+    app = web.Application()
+    app.add_routes([web.get('/', index), web.get('/status', status), web.get('/log', log)])
+    return app
+
+def _run_aiohttp_worker(port, worker=None, spec="none"):
+    app = create_aiohttp_app(port, RequestLog(capacity=1000), worker, ServiceProfile.parse(spec))
+    web.run_app(app, host="127.0.0.1", port=port,
+                reuse_port=worker is not None, access_log=None, print=None)
+
+def serve(port, mode="flask", workers=1, spec="none"):
+    """Run one backend on `port` until interrupted."""
+    if mode == "flask" and workers > 1:
+        raise ValueError("Several workers need the aiohttp server; Flask's development server runs one process")
+    if mode == "flask":
+        create_flask_app(port, RequestLog(capacity=1000), ServiceProfile.parse(spec)).run(port=port)
+        return
+
+    if web is None:
+        raise SystemExit("--server aiohttp needs aiohttp (pip install aiohttp)")
+    if workers <= 1:
+        print(f"Serving port {port} with aiohttp")
+        _run_aiohttp_worker(port, spec=spec)
+        return
+    if not hasattr(socket, "SO_REUSEPORT"):
+        raise SystemExit("--workers above 1 needs SO_REUSEPORT, which this platform does not support")
+
+    # Pre-fork: every worker binds the same port with SO_REUSEPORT and the kernel spreads connections across them
+    processes = [multiprocessing.Process(target=_run_aiohttp_worker, args=(port, i, spec), daemon=True) for i in range(workers)]
+    for process in processes:
+        process.start()
+    print(f"Serving port {port} with {workers} aiohttp workers (pids {', '.join(str(p.pid) for p in processes)})")
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stand-in backend server for the load balancers")
+    parser.add_argument("port", type=int, help="Port to listen on")
+    parser.add_argument("--server", choices=SERVER_MODES, default="flask", help="HTTP server implementation")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes for --server aiohttp (needs SO_REUSEPORT)")
+    parser.add_argument("--service-time", default="none",
+                        help="Service-time profile, e.g. constant:0.02, exponential:0.02/8 or bimodal:0.005:0.2:0.05")
+    args = parser.parse_args(argv)
+    if args.workers > 1 and args.server != "aiohttp":
+        parser.error("--workers above 1 needs --server aiohttp")
+    try:
+        ServiceProfile.parse(args.service_time)
+    except ValueError as e:
+        parser.error(str(e))
+    serve(args.port, args.server, args.workers, args.service_time)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+import threading
+
+# Integer counter with atomic updates. Each counter has its own lock, so threads
+# updating different servers never wait on each other.
+class AtomicCounter:
+    def __init__(self, value=0):
+        self._value = value
+        self._lock = threading.Lock()
+
+    @property
+    def value(self):
+        return self._value
+
+    def increment(self, amount=1):
+        with self._lock:
+            self._value += amount
+            return self._value
+
+    def decrement(self, amount=1):
+        with self._lock:
+            self._value -= amount
+            return self._value
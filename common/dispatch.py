@@ -0,0 +1,95 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Raised when a submission could not get a slot before its timeout
+class QueueFullError(RuntimeError):
+    pass
+
+# Fixed-size worker pool with a bounded submission queue. submit() blocks the caller once
+# `max_workers` tasks are running and `queue_size` more are waiting, so a fast producer is
+# slowed to the pool's pace instead of piling up threads or queued work.
+class BoundedExecutor:
+    def __init__(self, max_workers=32, queue_size=64, thread_name_prefix="lb-worker"):
+        self.max_workers = max_workers
+        self.queue_size = queue_size
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+        self._slots = threading.BoundedSemaphore(max_workers + queue_size)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.peak_pending = 0
+        self.blocked = 0  # Submissions that had to wait for a slot
+        self.blocked_time = 0.0
+
+    def submit(self, fn, *args, timeout=None, **kwargs):
+        """Run fn(*args, **kwargs) on the pool, waiting for a slot when the pool and queue are full."""
+        if not self._slots.acquire(blocking=False):
+            start_time = time.perf_counter()
+            acquired = self._slots.acquire(timeout=timeout) if timeout is not None else self._slots.acquire()
+            with self._lock:
+                self.blocked += 1
+                self.blocked_time += time.perf_counter() - start_time
+            if not acquired:
+                raise QueueFullError(f"No worker slot free within {timeout}s ({self.max_workers} workers, queue of {self.queue_size})")
+
+        with self._lock:
+            self._pending += 1
+            self.submitted += 1
+            self.peak_pending = max(self.peak_pending, self._pending)
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except BaseException:
+            # Never ran (e.g. the pool is shut down): take back the submission rather than count a completion
+            with self._lock:
+                self._pending -= 1
+                self.submitted -= 1
+            self._slots.release()
+            raise
+        future.add_done_callback(self._task_done)
+        return future
+
+    def _task_done(self, future):
+        with self._lock:
+            self._pending -= 1
+            self.completed += 1
+            if future.cancelled() or future.exception() is not None:
+                self.failed += 1
+        self._slots.release()
+
+    @property
+    def pending(self):
+        """Tasks submitted but not yet finished (running or waiting in the queue)."""
+        return self._pending
+
+    def shutdown(self, wait=True, cancel_pending=False):
+        """Stop accepting work; with wait=True, block until every accepted task has finished."""
+        self._executor.shutdown(wait=wait, cancel_futures=cancel_pending)
+
+    def metrics(self):
+        return {
+            'workers': self.max_workers,
+            'queue_size': self.queue_size,
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'failed': self.failed,
+            'pending': self._pending,
+            'peak_pending': self.peak_pending,
+            'blocked': self.blocked,
+            'blocked_time': self.blocked_time,
+        }
+
+    def print_metrics(self):
+        m = self.metrics()
+        print(f"\nWorker pool ({m['workers']} workers, queue of {m['queue_size']}):")
+        print(f"  {m['submitted']} submitted, {m['completed']} completed, {m['failed']} failed, peak in flight {m['peak_pending']}")
+        print(f"  Producer blocked {m['blocked']} times for {m['blocked_time']:.2f}s total")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown(wait=True)
+        return False
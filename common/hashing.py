@@ -0,0 +1,93 @@
+import hashlib
+
+try:
+    import xxhash
+except ImportError:  # Optional, pip install xxhash
+    xxhash = None
+
+try:
+    import mmh3
+except ImportError:  # Optional, pip install mmh3
+    mmh3 = None
+
+FNV64_OFFSET = 0xcbf29ce484222325
+FNV64_PRIME = 0x100000001b3
+MASK64 = (1 << 64) - 1
+JUMP_MULTIPLIER = 2862933555777941757  # LCG constant from the jump consistent hash paper
+
+# A named hash function mapping a string key to a non-negative integer of `bits` bits
+class HashStrategy:
+    def __init__(self, name, func, bits):
+        self.name = name
+        self.func = func  # bytes -> int
+        self.bits = bits
+
+    def __call__(self, key):
+        return self.func(key.encode())
+
+    def fixed64(self, hash_value):
+        """Map a hash value of this strategy onto 64 bits without changing its sort order."""
+        if self.bits > 64:
+            return hash_value >> (self.bits - 64)
+        return hash_value << (64 - self.bits)
+
+    def hash64(self, key):
+        """Hash a key straight to the fixed 64-bit form used by NumPy routing."""
+        return self.fixed64(self(key))
+
+    def __repr__(self):
+        return f"HashStrategy({self.name!r}, bits={self.bits})"
+
+
+def _md5(data):
+    # Same value as int(hashlib.md5(data).hexdigest(), 16), without the hex string round trip
+    return int.from_bytes(hashlib.md5(data).digest(), 'big')
+
+def _md5_64(data):
+    return int.from_bytes(hashlib.md5(data).digest()[:8], 'big')
+
+def _sha256_32(data):
+    # Same value as int(hashlib.sha256(data).hexdigest(), 16) % 2**32
+    return int.from_bytes(hashlib.sha256(data).digest()[-4:], 'big')
+
+def _blake2b_64(data):
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'big')
+
+def _fnv1a_64(data):
+    hash_value = FNV64_OFFSET
+    for byte in data:
+        hash_value = ((hash_value ^ byte) * FNV64_PRIME) & MASK64
+    return hash_value
+
+HASH_STRATEGIES = {
+    "md5": HashStrategy("md5", _md5, 128),                # Compatibility: today's MD5 placements
+    "sha256-32": HashStrategy("sha256-32", _sha256_32, 32),  # Compatibility: get_hash() in "chvl and cbl"
+    "md5-64": HashStrategy("md5-64", _md5_64, 64),
+    "blake2b": HashStrategy("blake2b", _blake2b_64, 64),   # Fastest stdlib-only option
+    "fnv1a": HashStrategy("fnv1a", _fnv1a_64, 64),
+}
+if xxhash is not None:
+    HASH_STRATEGIES["xxhash"] = HashStrategy("xxhash", xxhash.xxh3_64_intdigest, 64)
+if mmh3 is not None:
+    HASH_STRATEGIES["murmur3"] = HashStrategy("murmur3", lambda data: mmh3.hash64(data, signed=False)[0], 64)
+
+# Fastest 64-bit strategy installed here
+HASH_STRATEGIES["fast"] = HASH_STRATEGIES.get("xxhash", HASH_STRATEGIES["blake2b"])
+
+def jump_hash(key, num_buckets):
+    """Jump consistent hash: map a 64-bit key to a bucket in [0, num_buckets); growing to n+1 buckets moves 1/(n+1) of keys."""
+    bucket, jump = -1, 0
+    while jump < num_buckets:
+        bucket = jump
+        key = (key * JUMP_MULTIPLIER + 1) & MASK64
+        jump = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+def get_hash_strategy(strategy):
+    """Look up a strategy by name; HashStrategy instances are returned unchanged."""
+    if isinstance(strategy, HashStrategy):
+        return strategy
+    try:
+        return HASH_STRATEGIES[strategy]
+    except KeyError:
+        raise ValueError(f"Unknown hash strategy {strategy!r}, choose from: {', '.join(HASH_STRATEGIES)}") from None
@@ -0,0 +1,125 @@
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor
+
+# Defaults for the --health-* command-line flags
+DEFAULT_HEALTH_OPTIONS = {
+    "interval": 2.0,  # Seconds between probe rounds
+    "timeout": 1.0,   # Seconds before a probe counts as failed
+    "rise": 2,        # Consecutive successes before a down server is marked up
+    "fall": 3,        # Consecutive failures before an up server is marked down
+}
+
+# Probe state for one backend
+class _ServerHealth:
+    def __init__(self, healthy):
+        self.healthy = healthy
+        self.successes = 0  # Consecutive successful probes
+        self.failures = 0   # Consecutive failed probes
+        self.probes = 0
+        self.failed_probes = 0
+        self.transitions = 0
+        self.last_error = None
+
+# Background checker that probes every backend's /status endpoint and reports up/down changes.
+# A server only changes state after `rise` straight successes or `fall` straight failures, so a
+# single slow probe does not flap it. State changes are handed to on_change(server, healthy),
+# normally the balancer's set_server_active, which keeps request-time selection O(1).
+class HealthChecker:
+    def __init__(self, servers, on_change, interval=2.0, timeout=1.0, rise=2, fall=3, path="/status"):
+        self.servers = list(servers)
+        self.on_change = on_change
+        self.interval = interval
+        self.timeout = timeout
+        self.rise = rise
+        self.fall = fall
+        self.path = path
+        self.health = {server: _ServerHealth(getattr(server, 'active', True)) for server in self.servers}
+        self._sessions = {server: requests.Session() for server in self.servers}
+        self._probe_pool = ThreadPoolExecutor(max_workers=min(len(self.servers), 16) or 1, thread_name_prefix="health-probe")
+        self._stop = threading.Event()
+        self._thread = None
+
+    def probe(self, server):
+        """One GET of the health endpoint; returns None when healthy, otherwise the reason it failed."""
+        try:
+            response = self._sessions[server].get(f"http://{server.ip}:{server.port}{self.path}", timeout=self.timeout)
+        except requests.exceptions.RequestException as e:
+            return f"{type(e).__name__}"
+        if response.status_code != 200:
+            return f"HTTP {response.status_code}"
+        return None
+
+    def check_once(self, decisive=False):
+        """Probe every server once and apply any state changes; decisive=True lets one probe decide."""
+        errors = list(self._probe_pool.map(self.probe, self.servers))
+        for server, error in zip(self.servers, errors):
+            self._record(server, error, decisive)
+
+    def _record(self, server, error, decisive):
+        state = self.health[server]
+        state.probes += 1
+        if error is None:
+            state.successes += 1
+            state.failures = 0
+            flip = not state.healthy and (decisive or state.successes >= self.rise)
+        else:
+            state.failed_probes += 1
+            state.failures += 1
+            state.successes = 0
+            state.last_error = error
+            flip = state.healthy and (decisive or state.failures >= self.fall)
+        if flip:
+            state.healthy = not state.healthy
+            state.transitions += 1
+            if state.healthy:
+                print(f"Health check: Server {server.port} is UP ({state.successes} successful probes)")
+            else:
+                print(f"Health check: Server {server.port} is DOWN ({state.failures} failed probes, last error: {error})")
+            self.on_change(server, state.healthy)
+
+    def start(self, initial_check=True):
+        """Run probe rounds on a daemon thread; the first round is synchronous and decisive so dead backends are out before traffic starts."""
+        if initial_check:
+            self.check_once(decisive=True)
+        self._thread = threading.Thread(target=self._run, name="health-checker", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check_once()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._probe_pool.shutdown(wait=True)
+        for session in self._sessions.values():
+            session.close()
+
+    def is_healthy(self, server):
+        return self.health[server].healthy
+
+    def print_status(self):
+        print("\nHealth checks:")
+        for server in self.servers:
+            state = self.health[server]
+            status = "UP" if state.healthy else "DOWN"
+            print(f"Server {server.ip}:{server.port} -> {status}, probes: {state.probes} ({state.failed_probes} failed), "
+                  f"transitions: {state.transitions}, last error: {state.last_error}")
+
+
+def add_health_arguments(parser):
+    """Add the shared --health-* flags to a balancer's argument parser."""
+    parser.add_argument("--no-health-check", action="store_true", help="Do not probe backends; every server stays active")
+    parser.add_argument("--health-interval", type=float, default=DEFAULT_HEALTH_OPTIONS["interval"], help="Seconds between health probes")
+    parser.add_argument("--health-timeout", type=float, default=DEFAULT_HEALTH_OPTIONS["timeout"], help="Seconds before a health probe fails")
+    parser.add_argument("--rise", type=int, default=DEFAULT_HEALTH_OPTIONS["rise"], help="Successful probes before a down server is used again")
+    parser.add_argument("--fall", type=int, default=DEFAULT_HEALTH_OPTIONS["fall"], help="Failed probes before a server is taken out")
+
+def start_health_checker(args, servers, on_change):
+    """Start a HealthChecker configured from add_health_arguments() flags, or return None if disabled."""
+    if args.no_health_check:
+        return None
+    return HealthChecker(servers, on_change, args.health_interval, args.health_timeout, args.rise, args.fall).start()
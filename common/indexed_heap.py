@@ -0,0 +1,74 @@
+# Binary min-heap that also knows where every item sits, so an item's priority can be
+# changed or the item removed in O(log n) instead of rebuilding or scanning the heap.
+class IndexedHeap:
+    def __init__(self):
+        self._heap = []       # [priority, item] pairs in heap order
+        self._positions = {}  # item -> index into self._heap
+
+    def __len__(self):
+        return len(self._heap)
+
+    def __contains__(self, item):
+        return item in self._positions
+
+    def peek(self):
+        """Item with the smallest priority (ties are broken by whatever the priority tuple holds)."""
+        return self._heap[0][1]
+
+    def priority(self, item):
+        return self._heap[self._positions[item]][0]
+
+    def push(self, item, priority):
+        if item in self._positions:
+            self.update(item, priority)
+            return
+        self._heap.append([priority, item])
+        self._positions[item] = len(self._heap) - 1
+        self._sift_up(len(self._heap) - 1)
+
+    def update(self, item, priority):
+        index = self._positions[item]
+        old_priority = self._heap[index][0]
+        self._heap[index][0] = priority
+        if priority < old_priority:
+            self._sift_up(index)
+        else:
+            self._sift_down(index)
+
+    def remove(self, item):
+        index = self._positions.pop(item)
+        last = self._heap.pop()
+        if index < len(self._heap):
+            self._heap[index] = last
+            self._positions[last[1]] = index
+            self._sift_up(index)
+            self._sift_down(self._positions[last[1]])
+
+    def _swap(self, i, j):
+        heap = self._heap
+        heap[i], heap[j] = heap[j], heap[i]
+        self._positions[heap[i][1]] = i
+        self._positions[heap[j][1]] = j
+
+    def _sift_up(self, index):
+        heap = self._heap
+        while index > 0:
+            parent = (index - 1) // 2
+            if heap[index][0] < heap[parent][0]:
+                self._swap(index, parent)
+                index = parent
+            else:
+                break
+
+    def _sift_down(self, index):
+        heap = self._heap
+        size = len(heap)
+        while True:
+            smallest = index
+            for child in (2 * index + 1, 2 * index + 2):
+                if child < size and heap[child][0] < heap[smallest][0]:
+                    smallest = child
+            if smallest == index:
+                return
+            self._swap(index, smallest)
+            index = smallest
@@ -0,0 +1,182 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+import queue
+import signal
+import sys
+import time
+
+try:
+    from aiohttp import web
+except ImportError:  # Optional, pip install aiohttp (the launcher needs it)
+    web = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # Repository root, when run as a script
+from common.backend_server import create_aiohttp_app
+from common.request_log import RequestLog
+from common.service_time import ServiceProfile, parse_server_profiles
+
+# Backend fleet launcher: serves the stand-in backend routes on many ports from a few processes.
+# Each process runs one asyncio event loop with a listener per port, so a fleet of hundreds of
+# backends starts in about a second and reports READY once every port is accepting connections.
+# --service-time sets how long every backend takes to answer and --server-profile overrides it per
+# port, so a fleet can mix fast, slow and heavy-tailed servers (specs in common/service_time.py).
+#
+#   python -m common.launcher --ports 5001-5004
+#   python -m common.launcher --ports 6000-6499 --processes 4 --ready-file /tmp/backends.ready
+#   python -m common.launcher --ports 5001-5004 --service-time exponential:0.02/8 --server-profile 5004=bimodal:0.02:0.5:0.05/4
+
+def parse_ports(spec):
+    """Turn '5001-5004,6000' into [5001, 5002, 5003, 5004, 6000]."""
+    ports = []
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            first, last = (int(p) for p in part.split('-', 1))
+            ports.extend(range(first, last + 1))
+        else:
+            ports.append(int(part))
+    if not ports:
+        raise ValueError(f"No ports in {spec!r}")
+    return ports
+
+async def _serve_ports(ports, host, on_ready, profiles=None):
+    profiles = profiles or {}
+    runners = []
+
+    async def start(port):
+        profile = ServiceProfile.parse(profiles.get(port, "none"))
+        runner = web.AppRunner(create_aiohttp_app(port, RequestLog(capacity=1000), profile=profile), access_log=None)
+        await runner.setup()
+        runners.append(runner)
+        await web.TCPSite(runner, host, port).start()
+
+    try:
+        await asyncio.gather(*(start(port) for port in ports))
+        on_ready()
+        await asyncio.Event().wait()  # Serve until the process is stopped
+    finally:
+        for runner in runners:
+            await runner.cleanup()
+
+def _run_shard(ports, host, messages, profiles=None):
+    try:
+        asyncio.run(_serve_ports(ports, host, lambda: messages.put(("ready", os.getpid(), len(ports))), profiles))
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:  # Any startup failure, not just a port in use, so wait_ready() fails fast
+        messages.put(("error", os.getpid(), f"{type(e).__name__}: {e} (ports {ports[0]}..{ports[-1]})"))
+
+# Handle on a running fleet: start(), wait_ready(), stop(), or use it as a context manager
+class BackendFleet:
+    def __init__(self, ports, processes=1, host="127.0.0.1", profiles=None):
+        if web is None:
+            raise RuntimeError("The backend launcher needs aiohttp (pip install aiohttp)")
+        self.ports = list(ports)
+        self.host = host
+        self.profiles = dict(profiles or {})  # Port -> service-time spec; unlisted ports answer at once
+        processes = max(1, min(processes, len(self.ports)))
+        self.shards = [self.ports[i::processes] for i in range(processes)]  # Ports dealt out round-robin
+        self._messages = multiprocessing.Queue()
+        self.processes = [multiprocessing.Process(target=_run_shard, daemon=True,
+                                                  args=(shard, host, self._messages, {p: self.profiles[p] for p in shard if p in self.profiles}))
+                          for shard in self.shards]
+        self.started_at = None
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        for process in self.processes:
+            process.start()
+        return self
+
+    def wait_ready(self, timeout=30.0):
+        """Block until every shard is listening; returns the startup time in seconds."""
+        deadline = time.monotonic() + timeout
+        ready = 0
+        while ready < len(self.processes):
+            try:
+                kind, pid, detail = self._messages.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                self.stop()
+                raise TimeoutError(f"Only {ready}/{len(self.processes)} backend processes ready after {timeout}s") from None
+            if kind == "error":
+                self.stop()
+                raise RuntimeError(f"Backend process {pid} failed to start: {detail}")
+            ready += 1
+        return time.perf_counter() - self.started_at
+
+    def stop(self):
+        for process in self.processes:
+            if process.is_alive():
+                process.terminate()
+        for process in self.processes:
+            process.join()
+
+    def __enter__(self):
+        self.start()
+        self.wait_ready()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+def launch_backends(ports, processes=1, host="127.0.0.1", timeout=30.0, profiles=None):
+    """Start a fleet and wait until it is ready; call .stop() on the result when done."""
+    fleet = BackendFleet(ports, processes, host, profiles).start()
+    fleet.wait_ready(timeout)
+    return fleet
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve stand-in backends on many ports from a few processes")
+    parser.add_argument("--ports", default="5001-5004", help="Ports to serve, e.g. 5001-5004 or 6000-6499,7000")
+    parser.add_argument("--processes", type=int, default=1, help="Processes to shard the ports across")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--ready-file", help="Write the served ports to this file once every port is listening")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Seconds to wait for the fleet to come up")
+    parser.add_argument("--service-time", default="none",
+                        help="Service-time profile for every backend, e.g. exponential:0.02 or lognormal:0.02:0.8/8")
+    parser.add_argument("--server-profile", action="append", default=[], metavar="PORT=SPEC",
+                        help="Service-time profile for one port, overriding --service-time (repeatable)")
+    args = parser.parse_args(argv)
+
+    ports = parse_ports(args.ports)
+    try:
+        profiles = parse_server_profiles(ports, args.service_time, args.server_profile)
+    except ValueError as e:
+        parser.error(str(e))
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))  # Run the cleanup below on kill as well as Ctrl+C
+    fleet = BackendFleet(ports, args.processes, args.host, profiles).start()
+    try:
+        elapsed = fleet.wait_ready(args.timeout)
+    except (RuntimeError, TimeoutError) as e:
+        raise SystemExit(str(e))
+
+    try:
+        if args.ready_file:
+            with open(args.ready_file, 'w') as f:
+                f.write('\n'.join(str(port) for port in ports) + '\n')
+        print(f"READY {len(ports)} backends on {args.host} ports {args.ports} "
+              f"from {len(fleet.processes)} process(es) in {elapsed:.2f}s", flush=True)
+        for port in ports:
+            if profiles[port] != args.service_time:
+                print(f"  port {port}: service time {profiles[port]}", flush=True)
+        for process in fleet.processes:
+            process.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # Ignore further signals (timeout and Ctrl+C reach the whole process group) so cleanup runs to the end
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        try:
+            if args.ready_file and os.path.exists(args.ready_file):
+                os.remove(args.ready_file)  # First, so nothing waiting on it mistakes a stopping fleet for a ready one
+        finally:
+            fleet.stop()
+
+if __name__ == "__main__":
+    main()
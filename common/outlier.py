@@ -0,0 +1,244 @@
+import threading
+from collections import deque
+
+# Circuit states
+CLOSED = "closed"        # Normal traffic
+OPEN = "open"            # Ejected; no traffic until the ejection time runs out
+HALF_OPEN = "half-open"  # A limited number of probe requests decide whether to close or reopen
+
+# Defaults for the --outlier-* command-line flags
+DEFAULT_OUTLIER_OPTIONS = {
+    "consecutive_errors": 5,  # Failures in a row that eject a server
+    "error_rate": 0.5,        # Failure ratio over the window that ejects a server
+    "window": 20,             # Recent requests kept per server for the error rate
+    "min_requests": 10,       # Requests needed in the window before the error rate or latency is judged
+    "latency_factor": 3.0,    # Eject when a server's smoothed latency exceeds this multiple of the median
+    "min_latency": 0.005,     # Seconds; latencies below this are never treated as outliers
+    "ejection_time": 10.0,    # Base seconds a server stays ejected (multiplied by repeat ejections)
+    "max_ejection_time": 300.0,
+    "max_ejection_percent": 50,  # Never eject more than this share of the pool
+    "probe_budget": 1,        # Requests let through in half-open state
+}
+
+# Passive failure tracking for one backend
+class _Circuit:
+    def __init__(self, window):
+        self.state = CLOSED
+        self.healthy = True         # Last verdict from the active health checker
+        self.consecutive_failures = 0
+        self.outcomes = deque(maxlen=window)  # True for each failed request
+        self.failures_in_window = 0
+        self.ewma_latency = None
+        self.samples = 0
+        self.ejections = 0          # Consecutive ejections, scales the ejection time
+        self.total_ejections = 0
+        self.probes_started = 0
+        self.probes_succeeded = 0
+        self.timer = None
+        self.last_reason = None
+
+# Passive outlier detector and circuit breaker shared by every balancer. Request code reports
+# each outcome; a server that fails too often in a row, too often over a window, or is much
+# slower than its peers is ejected for a while, then gets a small probe budget in half-open
+# state before it is trusted again. The detector also takes the health checker's verdicts, so
+# the balancer is told a server is usable only when it is both healthy and not ejected.
+class OutlierDetector:
+    def __init__(self, servers, set_active, consecutive_errors=5, error_rate=0.5, window=20, min_requests=10,
+                 latency_factor=3.0, min_latency=0.005, ejection_time=10.0, max_ejection_time=300.0,
+                 max_ejection_percent=50, probe_budget=1, ewma_alpha=0.2):
+        self.servers = list(servers)
+        self.set_active = set_active  # Normally the balancer's set_server_active
+        self.consecutive_errors = consecutive_errors
+        self.error_rate = error_rate
+        self.min_requests = min_requests
+        self.latency_factor = latency_factor
+        self.min_latency = min_latency
+        self.ejection_time = ejection_time
+        self.max_ejection_time = max_ejection_time
+        self.max_ejected = max(1, len(self.servers) * max_ejection_percent // 100)
+        self.probe_budget = probe_budget
+        self.ewma_alpha = ewma_alpha
+        self.circuits = {server: _Circuit(window) for server in self.servers}
+        self._lock = threading.Lock()
+        self._stopped = False
+
+    def on_request(self, server):
+        """Call once a request has been routed to server; spends the half-open probe budget."""
+        with self._lock:
+            circuit = self.circuits[server]
+            if circuit.state != HALF_OPEN:
+                return
+            circuit.probes_started += 1
+            budget_spent = circuit.probes_started >= self.probe_budget
+        if budget_spent:
+            self._apply(server)  # No more traffic until the probes report back
+
+    def record_response(self, server, status_code, latency):
+        """Report a completed request; 5xx responses count as failures."""
+        if status_code >= 500:
+            self.record_failure(server, f"HTTP {status_code}")
+        else:
+            self.record_success(server, latency)
+
+    def record_success(self, server, latency):
+        with self._lock:
+            circuit = self.circuits[server]
+            if circuit.state == OPEN:
+                return  # A request sent before the ejection finished late; it does not change the verdict
+            circuit.consecutive_failures = 0
+            self._record_outcome(circuit, False)
+            circuit.samples += 1
+            if circuit.ewma_latency is None:
+                circuit.ewma_latency = latency
+            else:
+                circuit.ewma_latency += self.ewma_alpha * (latency - circuit.ewma_latency)
+
+            if circuit.state == HALF_OPEN:
+                circuit.probes_succeeded += 1
+                if circuit.probes_succeeded < self.probe_budget:
+                    return
+                self._close(circuit)
+                print(f"Circuit for Server {server.port} closed after {circuit.probes_succeeded} successful probes")
+            else:
+                reason = self._latency_outlier(server, circuit)
+                if reason is None or not self._eject(server, circuit, reason):
+                    return
+        self._apply(server)
+
+    def record_failure(self, server, error):
+        with self._lock:
+            circuit = self.circuits[server]
+            if circuit.state == OPEN:
+                return
+            circuit.consecutive_failures += 1
+            self._record_outcome(circuit, True)
+
+            if circuit.state == HALF_OPEN:
+                reason = f"probe failed: {error}"
+            elif circuit.consecutive_failures >= self.consecutive_errors:
+                reason = f"{circuit.consecutive_failures} consecutive errors, last: {error}"
+            elif len(circuit.outcomes) >= self.min_requests and circuit.failures_in_window / len(circuit.outcomes) >= self.error_rate:
+                reason = f"error rate {circuit.failures_in_window}/{len(circuit.outcomes)}, last: {error}"
+            else:
+                return
+            if not self._eject(server, circuit, reason):
+                return
+        self._apply(server)
+
+    def health_changed(self, server, healthy):
+        """Health checker hook: combine the active probe verdict with the circuit state."""
+        with self._lock:
+            self.circuits[server].healthy = healthy
+        self._apply(server)
+
+    def _record_outcome(self, circuit, failed):
+        if len(circuit.outcomes) == circuit.outcomes.maxlen and circuit.outcomes[0]:
+            circuit.failures_in_window -= 1
+        circuit.outcomes.append(failed)
+        if failed:
+            circuit.failures_in_window += 1
+
+    def _latency_outlier(self, server, circuit):
+        if circuit.samples < self.min_requests or circuit.ewma_latency < self.min_latency:
+            return None
+        peers = sorted(c.ewma_latency for s, c in self.circuits.items()
+                       if s is not server and c.state == CLOSED and c.samples >= self.min_requests)
+        if not peers:
+            return None
+        median = peers[len(peers) // 2]
+        if circuit.ewma_latency > self.latency_factor * median:
+            return f"latency {circuit.ewma_latency * 1000:.1f} ms vs peer median {median * 1000:.1f} ms"
+        return None
+
+    def _eject(self, server, circuit, reason):
+        """Open the circuit; called with the lock held. Returns False when the ejection cap stops it."""
+        ejected = sum(1 for c in self.circuits.values() if c.state != CLOSED)
+        if circuit.state == CLOSED and ejected >= self.max_ejected:
+            return False
+        circuit.ejections += 1
+        circuit.total_ejections += 1
+        circuit.state = OPEN
+        circuit.last_reason = reason
+        duration = min(self.ejection_time * circuit.ejections, self.max_ejection_time)
+        print(f"Circuit for Server {server.port} opened for {duration:.0f}s ({reason})")
+        if circuit.timer is not None:
+            circuit.timer.cancel()
+        if not self._stopped:
+            circuit.timer = threading.Timer(duration, self._half_open, args=(server,))
+            circuit.timer.daemon = True
+            circuit.timer.start()
+        return True
+
+    def _half_open(self, server):
+        with self._lock:
+            circuit = self.circuits[server]
+            if circuit.state != OPEN:
+                return
+            circuit.state = HALF_OPEN
+            circuit.probes_started = 0
+            circuit.probes_succeeded = 0
+            circuit.timer = None
+        print(f"Circuit for Server {server.port} half-open, allowing {self.probe_budget} probe request(s)")
+        self._apply(server)
+
+    def _close(self, circuit):
+        circuit.state = CLOSED
+        circuit.ejections = 0
+        circuit.consecutive_failures = 0
+        circuit.outcomes.clear()
+        circuit.failures_in_window = 0
+        circuit.ewma_latency = None  # Judge the server on fresh latencies, not the ones that ejected it
+        circuit.samples = 0
+
+    def is_available(self, server):
+        """True when the balancer may route to server: healthy, and closed or half-open with budget left."""
+        circuit = self.circuits[server]
+        if not circuit.healthy or circuit.state == OPEN:
+            return False
+        return circuit.state == CLOSED or circuit.probes_started < self.probe_budget
+
+    def _apply(self, server):
+        # Called without the lock: set_active may drain queued requests, whose outcomes come back here.
+        # Racing callers can land their verdicts out of order, so each one re-reads the verdict after
+        # applying it and applies again until it is still current; the last verdict to land is then right.
+        while True:
+            with self._lock:
+                available = self.is_available(server)
+            self.set_active(server, available)
+            with self._lock:
+                if self.is_available(server) == available:
+                    return
+
+    def stop(self):
+        with self._lock:
+            self._stopped = True
+            for circuit in self.circuits.values():
+                if circuit.timer is not None:
+                    circuit.timer.cancel()
+                    circuit.timer = None
+
+    def print_status(self):
+        print("\nOutlier detection:")
+        for server in self.servers:
+            circuit = self.circuits[server]
+            latency = f"{circuit.ewma_latency * 1000:.2f} ms" if circuit.ewma_latency is not None else "n/a"
+            print(f"Server {server.ip}:{server.port} -> circuit {circuit.state}, ejections: {circuit.total_ejections}, "
+                  f"window errors: {circuit.failures_in_window}/{len(circuit.outcomes)}, latency EWMA: {latency}, "
+                  f"last reason: {circuit.last_reason}")
+
+
+def add_outlier_arguments(parser):
+    """Add the shared outlier-detection flags to a balancer's argument parser."""
+    parser.add_argument("--no-outlier-detection", action="store_true", help="Keep routing to servers that fail or respond slowly")
+    parser.add_argument("--consecutive-errors", type=int, default=DEFAULT_OUTLIER_OPTIONS["consecutive_errors"], help="Failures in a row that eject a server")
+    parser.add_argument("--error-rate", type=float, default=DEFAULT_OUTLIER_OPTIONS["error_rate"], help="Failure ratio over recent requests that ejects a server")
+    parser.add_argument("--latency-factor", type=float, default=DEFAULT_OUTLIER_OPTIONS["latency_factor"], help="Eject servers this many times slower than the median")
+    parser.add_argument("--ejection-time", type=float, default=DEFAULT_OUTLIER_OPTIONS["ejection_time"], help="Base seconds an ejected server is kept out")
+    parser.add_argument("--probe-budget", type=int, default=DEFAULT_OUTLIER_OPTIONS["probe_budget"], help="Requests allowed through a half-open circuit")
+
+def build_outlier_detector(args, servers, set_active):
+    """Create an OutlierDetector from add_outlier_arguments() flags, or return None if disabled."""
+    if args.no_outlier_detection:
+        return None
+    return OutlierDetector(servers, set_active, consecutive_errors=args.consecutive_errors, error_rate=args.error_rate,
+                           latency_factor=args.latency_factor, ejection_time=args.ejection_time, probe_budget=args.probe_budget)
@@ -0,0 +1,157 @@
+import threading
+import time
+from collections import deque
+
+OVERFLOW_POLICIES = ("reject", "drop-oldest")
+
+# A request waiting for a server, with the times used for deadlines and wait metrics
+class _PendingEntry:
+    __slots__ = ("item", "enqueued_at", "deadline")
+
+    def __init__(self, item, enqueued_at, deadline):
+        self.item = item
+        self.enqueued_at = enqueued_at
+        self.deadline = deadline
+
+# Bounded FIFO of requests that arrived while no server could take them. Nothing here blocks
+# the caller: put() returns at once, entries past their deadline are discarded, and drain()
+# hands the backlog to a dispatch callback whenever the balancer has a server again.
+class PendingQueue:
+    def __init__(self, max_size=100, deadline=30.0, overflow="reject", on_discard=None):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy {overflow!r}, choose from: {', '.join(OVERFLOW_POLICIES)}")
+        self.max_size = max_size
+        self.deadline = deadline  # Default seconds a request may wait (None waits forever)
+        self.overflow = overflow
+        self.on_discard = on_discard  # Called as on_discard(item, reason) for rejected, dropped and timed-out requests
+        self._entries = deque()
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._next_deadline = None
+
+        # Queue metrics
+        self.enqueued = 0
+        self.dispatched = 0
+        self.rejected = 0     # Refused because the queue was full (reject policy)
+        self.dropped = 0      # Evicted to make room for a newer request (drop-oldest policy)
+        self.timed_out = 0    # Still waiting when their deadline passed
+        self.peak_depth = 0
+        self.total_wait = 0.0  # Seconds dispatched requests spent queued
+        self.max_wait = 0.0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def put(self, item, deadline=None):
+        """Queue an item; returns False if the reject policy turned it away."""
+        discarded = []
+        now = time.monotonic()
+        deadline = self.deadline if deadline is None else deadline
+        with self._lock:
+            discarded.extend((entry.item, "timed out") for entry in self._expire_locked(now))
+            if len(self._entries) >= self.max_size:
+                if self.overflow == "reject":
+                    self.rejected += 1
+                    discarded.append((item, "rejected"))
+                    accepted = False
+                else:
+                    self.dropped += 1
+                    discarded.append((self._entries.popleft().item, "dropped"))
+                    accepted = True
+            else:
+                accepted = True
+            if accepted:
+                entry = _PendingEntry(item, now, now + deadline if deadline is not None else None)
+                self._entries.append(entry)
+                self.enqueued += 1
+                self.peak_depth = max(self.peak_depth, len(self._entries))
+                if entry.deadline is not None and (self._next_deadline is None or entry.deadline < self._next_deadline):
+                    self._next_deadline = entry.deadline
+            self._changed.notify_all()
+        self._report(discarded)
+        return accepted
+
+    def drain(self, dispatch):
+        """Pass queued items to dispatch(item) oldest first until it returns False or the queue empties."""
+        drained = 0
+        discarded = []
+        while True:
+            with self._lock:
+                discarded.extend((entry.item, "timed out") for entry in self._expire_locked(time.monotonic()))
+                if not self._entries:
+                    break
+                entry = self._entries.popleft()
+            if not dispatch(entry.item):
+                with self._lock:
+                    self._entries.appendleft(entry)  # Keep its place and its original deadline
+                break
+            wait = time.monotonic() - entry.enqueued_at
+            with self._lock:
+                self.dispatched += 1
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+            drained += 1
+        with self._lock:
+            self._changed.notify_all()
+        self._report(discarded)
+        return drained
+
+    def expire(self):
+        """Discard every entry whose deadline has passed; returns how many were removed."""
+        with self._lock:
+            expired = self._expire_locked(time.monotonic())
+            if expired:
+                self._changed.notify_all()
+        self._report([(entry.item, "timed out") for entry in expired])
+        return len(expired)
+
+    def join(self, timeout=None):
+        """Wait until the queue is empty, expiring entries as their deadlines pass; returns True if it emptied."""
+        end_time = None if timeout is None else time.monotonic() + timeout
+        while True:
+            self.expire()
+            with self._lock:
+                if not self._entries:
+                    return True
+                now = time.monotonic()
+                waits = [t - now for t in (self._next_deadline, end_time) if t is not None]
+                if end_time is not None and now >= end_time:
+                    return False
+                self._changed.wait(max(min(waits), 0.01) if waits else None)
+
+    def _expire_locked(self, now):
+        if self._next_deadline is None or now < self._next_deadline:
+            return []
+        expired = [entry for entry in self._entries if entry.deadline is not None and entry.deadline <= now]
+        if expired:
+            self._entries = deque(entry for entry in self._entries if entry.deadline is None or entry.deadline > now)
+            self.timed_out += len(expired)
+        deadlines = [entry.deadline for entry in self._entries if entry.deadline is not None]
+        self._next_deadline = min(deadlines) if deadlines else None
+        return expired
+
+    def _report(self, discarded):
+        if self.on_discard is not None:
+            for item, reason in discarded:
+                self.on_discard(item, reason)
+
+    def metrics(self):
+        return {
+            'depth': len(self._entries),
+            'peak_depth': self.peak_depth,
+            'max_size': self.max_size,
+            'enqueued': self.enqueued,
+            'dispatched': self.dispatched,
+            'rejected': self.rejected,
+            'dropped': self.dropped,
+            'timed_out': self.timed_out,
+            'avg_wait': self.total_wait / self.dispatched if self.dispatched else 0.0,
+            'max_wait': self.max_wait,
+        }
+
+    def print_metrics(self):
+        m = self.metrics()
+        print(f"\nPending queue (max {m['max_size']}, overflow: {self.overflow}, deadline: {self.deadline}s):")
+        print(f"  depth {m['depth']} (peak {m['peak_depth']}), {m['enqueued']} queued, {m['dispatched']} dispatched")
+        print(f"  {m['rejected']} rejected, {m['dropped']} dropped, {m['timed_out']} timed out")
+        print(f"  wait: avg {m['avg_wait']:.2f}s, max {m['max_wait']:.2f}s")
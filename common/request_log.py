@@ -0,0 +1,55 @@
+import threading
+from collections import Counter, deque
+
+# Request log for the backend servers: a fixed-capacity ring buffer of recent entries plus running
+# totals, so memory stays flat and a status summary costs the same after ten requests or ten million.
+# Every entry gets a sequence number, which lets readers page through the log with a stable cursor
+# while the buffer keeps rotating.
+class RequestLog:
+    def __init__(self, capacity=1000, recent=10):
+        self.capacity = capacity
+        self.recent = recent  # Entries included in summary()
+        self._entries = deque(maxlen=capacity)  # (sequence number, entry), oldest first
+        self._by_algorithm = Counter()
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def record(self, request_number, algorithm):
+        """Log one request and return its formatted entry."""
+        entry = f"{request_number}th request arrived from {algorithm}"
+        with self._lock:
+            self._total += 1
+            self._by_algorithm[algorithm] += 1
+            self._entries.append((self._total, entry))
+        return entry
+
+    @property
+    def total(self):
+        return self._total
+
+    def summary(self):
+        """Totals and the last few entries; cost does not grow with the number of requests served."""
+        with self._lock:
+            size = len(self._entries)
+            recent = [self._entries[i][1] for i in range(size - min(self.recent, size), size)]
+            return {
+                "total_requests": self._total,
+                "requests_by_algorithm": dict(self._by_algorithm),
+                "log_capacity": self.capacity,
+                "log_size": len(self._entries),
+                "recent_requests": recent,
+            }
+
+    def page(self, after=0, limit=100):
+        """Entries with sequence numbers greater than `after`, oldest first, at most `limit` of them."""
+        with self._lock:
+            oldest = self._entries[0][0] if self._entries else self._total + 1
+            start = max(after + 1, oldest) - oldest  # Index of the first wanted entry in the buffer
+            entries = [{"seq": seq, "entry": entry}
+                       for seq, entry in (self._entries[i] for i in range(start, min(start + limit, len(self._entries))))]
+            return {
+                "entries": entries,
+                "next": entries[-1]["seq"] if entries else max(after, oldest - 1),  # Pass back as `after` for the next page
+                "missed": max(0, oldest - after - 1),  # Entries after the cursor that were already overwritten
+                "total_requests": self._total,
+            }
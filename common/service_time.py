@@ -0,0 +1,180 @@
+import asyncio
+import math
+import random
+import threading
+import time
+
+# Service-time emulation for the stand-in backends. A profile is written as DISTRIBUTION[:PARAMS][/CAP]:
+#
+#   none                        answer at once (the default)
+#   constant:0.02               always 20 ms
+#   uniform:0.5:2.0             anywhere between 0.5 s and 2 s
+#   exponential:0.02            exponential with a 20 ms mean
+#   lognormal:0.02:0.8          lognormal with a 20 ms median and sigma 0.8
+#   bimodal:0.005:0.2:0.05      5 ms exponential, except 5% of requests take 0.2 s x Pareto(1.5) (heavy tail)
+#
+# An optional /CAP limits how many requests the server works on at once; the rest wait their turn,
+# e.g. exponential:0.02/8 is a server with 8 workers.
+DISTRIBUTIONS = {
+    "none": 0,
+    "constant": 1,
+    "uniform": 2,
+    "exponential": 1,
+    "lognormal": 2,
+    "bimodal": 3,
+}
+PARETO_ALPHA = 1.5  # Tail index of the slow mode in "bimodal"; below 2 the variance is infinite
+
+class ServiceProfile:
+    def __init__(self, distribution="none", params=(), concurrency=None, seed=None):
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(f"Unknown service-time distribution {distribution!r}, choose from: {', '.join(DISTRIBUTIONS)}")
+        if len(params) != DISTRIBUTIONS[distribution]:
+            raise ValueError(f"{distribution} takes {DISTRIBUTIONS[distribution]} parameter(s), got {len(params)}")
+        self.distribution = distribution
+        self.params = tuple(float(p) for p in params)
+        self._check_params()
+        self.concurrency = concurrency  # None means no cap
+        self.random = random.Random(seed)
+
+    def _check_params(self):
+        if any(p < 0 or math.isnan(p) for p in self.params):
+            raise ValueError(f"{self.distribution} parameters must be non-negative, got {self.params}")
+        if self.distribution == "uniform" and self.params[1] < self.params[0]:
+            raise ValueError(f"uniform needs low <= high, got {self.params[0]:g} > {self.params[1]:g}")
+        if self.distribution == "bimodal" and self.params[2] > 1:
+            raise ValueError(f"bimodal slow share must be between 0 and 1, got {self.params[2]:g}")
+
+    @classmethod
+    def parse(cls, spec, seed=None):
+        spec = spec.strip()
+        concurrency = None
+        if '/' in spec:
+            spec, cap = spec.split('/', 1)
+            concurrency = int(cap)
+            if concurrency < 1:
+                raise ValueError(f"Concurrency cap must be at least 1, got {concurrency}")
+        name, *params = spec.split(':')
+        return cls(name or "none", params, concurrency, seed)
+
+    def sample(self):
+        """Seconds the next request should take to serve."""
+        kind, p, rng = self.distribution, self.params, self.random
+        if kind == "none":
+            return 0.0
+        if kind == "constant":
+            return p[0]
+        if kind == "uniform":
+            return rng.uniform(p[0], p[1])
+        if kind == "exponential":
+            return rng.expovariate(1 / p[0]) if p[0] > 0 else 0.0
+        if kind == "lognormal":
+            return p[0] * math.exp(p[1] * rng.gauss(0.0, 1.0))
+        fast, slow, slow_share = p
+        if rng.random() < slow_share:
+            return slow * rng.paretovariate(PARETO_ALPHA)
+        return rng.expovariate(1 / fast) if fast > 0 else 0.0
+
+    @property
+    def is_instant(self):
+        return self.distribution == "none" and self.concurrency is None
+
+    def __str__(self):
+        text = ':'.join([self.distribution] + [f"{p:g}" for p in self.params])
+        return f"{text}/{self.concurrency}" if self.concurrency else text
+
+    def __repr__(self):
+        return f"ServiceProfile({str(self)!r})"
+
+# Applies a profile to requests on one backend: holds each request for a sampled service time, at
+# most `concurrency` at once, and counts how many are being served and how many are waiting.
+# serve_async() is for the aiohttp app, serve_blocking() for Flask's request threads.
+class ServiceEmulator:
+    def __init__(self, profile):
+        self.profile = profile
+        self.in_service = 0
+        self.waiting = 0
+        self.served = 0
+        self.busy_time = 0.0  # Sum of sampled service times, in seconds
+        self._lock = threading.Lock()
+        self._thread_slots = threading.BoundedSemaphore(profile.concurrency) if profile.concurrency else None
+        self._async_slots = None  # Created on first use, inside the serving event loop
+
+    def _begin(self):
+        with self._lock:
+            self.in_service += 1
+
+    def _end(self, seconds):
+        with self._lock:
+            self.in_service -= 1
+            self.served += 1
+            self.busy_time += seconds
+
+    def _stop_waiting(self):
+        with self._lock:
+            self.waiting -= 1
+
+    async def serve_async(self):
+        if self.profile.is_instant:
+            return
+        with self._lock:
+            self.waiting += 1
+        if self.profile.concurrency and self._async_slots is None:
+            self._async_slots = asyncio.Semaphore(self.profile.concurrency)
+        try:
+            if self._async_slots is not None:
+                await self._async_slots.acquire()
+        finally:
+            self._stop_waiting()  # Also when cancelled while queued, e.g. the client went away
+        self._begin()
+        seconds = self.profile.sample()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            self._end(seconds)
+            if self._async_slots is not None:
+                self._async_slots.release()
+
+    def serve_blocking(self):
+        if self.profile.is_instant:
+            return
+        with self._lock:
+            self.waiting += 1
+        try:
+            if self._thread_slots is not None:
+                self._thread_slots.acquire()
+        finally:
+            self._stop_waiting()
+        self._begin()
+        seconds = self.profile.sample()
+        try:
+            time.sleep(seconds)
+        finally:
+            self._end(seconds)
+            if self._thread_slots is not None:
+                self._thread_slots.release()
+
+    def summary(self):
+        with self._lock:
+            return {
+                "service_time": str(self.profile),
+                "concurrency_cap": self.profile.concurrency,
+                "in_service": self.in_service,
+                "waiting": self.waiting,
+                "mean_service_time": self.busy_time / self.served if self.served else 0.0,
+            }
+
+def parse_server_profiles(ports, default_spec="none", overrides=()):
+    """Map each port to its profile spec: the default, replaced by any PORT=SPEC override."""
+    profiles = {port: default_spec for port in ports}
+    for override in overrides:
+        port, _, spec = override.partition('=')
+        if not spec:
+            raise ValueError(f"Expected PORT=SPEC, got {override!r}")
+        port = int(port)
+        if port not in profiles:
+            raise ValueError(f"--server-profile for port {port}, which is not among the served ports")
+        ServiceProfile.parse(spec)  # Fail early on a bad spec
+        profiles[port] = spec
+    ServiceProfile.parse(default_spec)
+    return profiles
@@ -0,0 +1,8 @@
+import math
+
+# Nearest-rank percentile over an already sorted list of latencies
+def percentile(sorted_latencies, pct):
+    if not sorted_latencies:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_latencies)))
+    return sorted_latencies[min(rank, len(sorted_latencies)) - 1]
@@ -0,0 +1,66 @@
+import contextlib
+import io
+import random
+import threading
+import time
+
+class ConnectionAccountingError(RuntimeError):
+    pass
+
+# Concurrency check for the least-connection balancers: many threads pick and release servers
+# while another thread keeps flipping servers in and out of the pool. Afterwards every counter must
+# be exact and every heap priority current. Run by tests/test_connection_accounting.py.
+def stress_test_connection_accounting(balancer_class, server_class, num_requests=10000, num_threads=64, num_servers=16):
+    """Raises ConnectionAccountingError on any accounting error; returns the elapsed seconds otherwise."""
+    test_servers = [server_class("127.0.0.1", 6000 + i, weight=1 + i % 3) for i in range(num_servers)]
+    load_balancer = balancer_class(test_servers)
+    negative_counts = []
+    done = threading.Event()
+
+    def worker(count):
+        for _ in range(count):
+            server = load_balancer.get_next_server()
+            while server is None:
+                server = load_balancer.get_next_server()
+            time.sleep(random.uniform(0, 0.001))
+            if load_balancer.release_connection(server) < 0:
+                negative_counts.append(server.port)
+
+    def toggler():
+        # Keep flipping every server but the first in and out of the pool while requests run
+        while not done.is_set():
+            load_balancer.set_server_active(random.choice(test_servers[1:]), random.random() < 0.5)
+            time.sleep(0.0005)
+
+    per_thread = [num_requests // num_threads + (1 if i < num_requests % num_threads else 0) for i in range(num_threads)]
+    threads = [threading.Thread(target=worker, args=(count,)) for count in per_thread]
+    toggle_thread = threading.Thread(target=toggler)
+
+    start_time = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):  # Silence the per-request messages
+        toggle_thread.start()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        done.set()
+        toggle_thread.join()
+        for server in test_servers:
+            load_balancer.set_server_active(server, True)
+    elapsed = time.perf_counter() - start_time
+
+    total_requests = sum(server.request_count for server in test_servers)
+    open_connections = {server.port: server.active_connections for server in test_servers if server.active_connections}
+    heap = getattr(load_balancer, "heap", None)  # Latency-aware picks keep no heap
+    stale = [server.port for server in test_servers
+             if heap is not None and heap.priority(server) != load_balancer._priority(server)]
+    # Explicit checks rather than asserts, which python -O strips
+    if negative_counts:
+        raise ConnectionAccountingError(f"Counters went negative on servers {sorted(set(negative_counts))}")
+    if total_requests != num_requests:
+        raise ConnectionAccountingError(f"Counted {total_requests} requests, expected {num_requests}")
+    if open_connections:
+        raise ConnectionAccountingError(f"Connections left open after all requests finished: {open_connections}")
+    if stale:
+        raise ConnectionAccountingError(f"Heap priorities out of date for servers {stale}")
+    return elapsed
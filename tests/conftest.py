@@ -0,0 +1,20 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)  # Repository root, for the shared common/ package
+
+def _load_script(directory):
+    """Import <directory>/load_balancer.py; the balancer directories are scripts, not packages."""
+    path = os.path.join(ROOT, directory, "load_balancer.py")
+    spec = importlib.util.spec_from_file_location(f"{directory}_load_balancer", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+@pytest.fixture
+def load_script():
+    return _load_script
@@ -0,0 +1,12 @@
+import pytest
+
+from common.stress import stress_test_connection_accounting
+
+@pytest.mark.parametrize("directory, balancer", [
+    ("LeastConnection", "LeastConnectionLoadBalancer"),
+    ("LeastConnection", "LatencyAwareLoadBalancer"),
+    ("WeightedLeastConnection", "WeightedLeastConnectionLoadBalancer"),
+])
+def test_connection_accounting_under_concurrency(load_script, directory, balancer):
+    module = load_script(directory)
+    stress_test_connection_accounting(getattr(module, balancer), module.Server)
@@ -0,0 +1,26 @@
+import pytest
+
+@pytest.fixture
+def chvl(load_script):
+    return load_script("chvl and cbl")
+
+REQUEST_IDS = [f"request-{i}" for i in range(1000)]
+
+def assert_routes_nowhere(balancer):
+    owners, counts = balancer.route_batch(REQUEST_IDS)
+    assert (owners == -1).all()
+    assert counts.sum() == 0 and len(counts) == len(balancer.servers)
+    assert balancer.get_server(REQUEST_IDS[0]) is None
+
+def test_all_zero_weights_route_nowhere(chvl):
+    servers = ["S1", "S2"]
+    balancer = chvl.MaglevHashing(servers, {server: 0 for server in servers}, table_size=251)
+    assert_routes_nowhere(balancer)
+    balancer.add_servers(["S2"], {"S2": 3})  # Giving one server a weight again fills the whole table
+    owners, counts = balancer.route_batch(REQUEST_IDS)
+    assert (owners == 1).all() and counts.tolist() == [0, len(REQUEST_IDS)]
+
+def test_every_server_removed_routes_nowhere(chvl):
+    balancer = chvl.MaglevHashing(["S1", "S2", "S3"], table_size=251)
+    balancer.remove_servers(["S1", "S2", "S3"])
+    assert_routes_nowhere(balancer)
@@ -0,0 +1,34 @@
+import contextlib
+import io
+
+import pytest
+
+@pytest.fixture
+def wrr(load_script):
+    return load_script("WeightedRoundRobin")
+
+def picks(load_balancer, count):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return [load_balancer.get_next_server().port for _ in range(count)]
+
+@pytest.mark.parametrize("use_schedule_table", [False, True])
+def test_weight_zero_is_never_picked(wrr, use_schedule_table):
+    servers = [wrr.Server("127.0.0.1", 1, weight=1), wrr.Server("127.0.0.1", 2, weight=1)]
+    load_balancer = wrr.WeightedRoundRobinLoadBalancer(servers, use_schedule_table)
+    picks(load_balancer, 1)
+    load_balancer.set_weight(servers[1], 0)
+    assert picks(load_balancer, 4) == [1, 1, 1, 1]
+
+@pytest.mark.parametrize("use_schedule_table", [False, True])
+def test_reweighting_changes_the_share(wrr, use_schedule_table):
+    servers = [wrr.Server("127.0.0.1", port, weight=1) for port in (1, 2, 3)]
+    load_balancer = wrr.WeightedRoundRobinLoadBalancer(servers, use_schedule_table)
+    picks(load_balancer, 2)
+    load_balancer.set_weight(servers[0], 4)
+    load_balancer.set_weight(servers[2], 0)
+    ports = picks(load_balancer, 500)
+    assert 3 not in ports
+    assert ports.count(1) == pytest.approx(400, abs=5)
+    assert ports.count(2) == pytest.approx(100, abs=5)
+    load_balancer.set_weight(servers[2], 1)  # And back again
+    assert picks(load_balancer, 600).count(3) == pytest.approx(100, abs=5)